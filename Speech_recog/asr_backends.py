@@ -0,0 +1,483 @@
+"""
+Speech recognition backends for the transcriber.
+
+A backend turns float32 mono 16 kHz audio into text. realtime_transcribe.py
+only talks to this interface, so engines can be swapped from the command
+line (--backend / --model) and compared with benchmark_asr.py.
+
+Model libraries are imported in load(), not at module level, so importing
+this file stays cheap.
+
+Every backend takes an optional Vocabulary (vocabulary.py). Its entries
+are passed to the decoder as an initial prompt so device names are
+expected and spelt the way Ableton spells them. transcribe() can be
+given a different prompt per call instead, e.g. the text dictated so far.
+
+A backend instance is used by one thread at a time (Whisper installs its
+kv-cache hooks on the model per decode). ProcessBackend runs any backend
+in a child process instead, for parallel workers where decoding would
+hold the GIL.
+"""
+
+import os
+import json
+import math
+import multiprocessing
+
+
+class ASRBackend:
+    """Base class: subclasses implement load() and transcribe()"""
+
+    name = None
+
+    def __init__(self, model_size='base', model_dir=None, vocab=None):
+        self.model_size = model_size
+        self.model_dir = model_dir
+        self.vocab = vocab
+        self.model = None
+
+    @property
+    def prompt(self):
+        return self.vocab.prompt() if self.vocab else None
+
+    def load(self):
+        """Load the model; may take seconds, called from a background thread"""
+        raise NotImplementedError
+
+    def transcribe(self, audio, prompt=None):
+        """
+        Return the stripped transcription of float32 16 kHz mono audio.
+        prompt: text the audio follows on from, in place of the vocabulary
+        prompt ('' for none).
+        """
+        raise NotImplementedError
+
+    def describe(self):
+        return f"{self.name}:{self.model_size}" + ('+vocab' if self.vocab else '')
+
+
+class WhisperBackend(ASRBackend):
+    """
+    openai-whisper on PyTorch (fp32 on CPU).
+
+    mmap: memory-map the checkpoint and build the model on the meta device.
+    The fp16 checkpoint is converted straight into the fp32 weights, without
+    an in-memory copy of the file or a random initialisation first. Tensors
+    that are already fp32 (the non-Linear weights of a quantized cache, e.g.
+    the token embedding) stay file-backed.
+    quantize: apply dynamic int8 quantization to every Linear layer.
+    cache_path: where the quantized model is saved after the first
+    quantization and loaded from afterwards. A <cache_path>.json next to it
+    records the whisper and torch versions and the source checkpoint's
+    size and mtime; the cache is rebuilt when any of them differ (it is a
+    full pickle, so it is only loaded when it matches).
+    short: short-command fast path. transcribe() pads every clip to a 30 s
+    mel spectrogram; for a two-word command most of the encoder's work is
+    silence. Instead the encoder runs on the clip plus a little padding
+    (rounded up to whole seconds) and decoding is greedy with a budget of
+    max_tokens; with a per-call prompt (longer speech) the budget grows to
+    SHORT_TOKENS_PER_SECOND of audio. Clips longer than SHORT_MAX_SECONDS
+    use transcribe().
+    bias: with a vocabulary, the short-command decoder adds this to the
+    logit of every token that continues a vocabulary entry matching the
+    transcript so far.
+    threads: torch intra-op threads (0 = torch's default). The setting is
+    per process: the first backend loaded in a process applies it, and
+    every worker thread of that process shares the pool.
+    """
+
+    name = 'whisper'
+
+    # decode settings shared by warm-up and real commands, so warm-up
+    # exercises exactly the code paths a command will take
+    DECODE_OPTIONS = dict(
+        fp16=False,
+        language='en',
+        condition_on_previous_text=False,
+        temperature=0,
+        best_of=1,
+        beam_size=1,
+        word_timestamps=False
+    )
+
+    SHORT_PAD_SECONDS = 0.5     # silence after the command, the model expects some
+    SHORT_BUCKET_SECONDS = 1    # window rounding, keeps the number of shapes small
+    SHORT_MAX_SECONDS = 10
+    SHORT_MAX_TOKENS = 16       # a device name is a few tokens
+    SHORT_TOKENS_PER_SECOND = 8 # budget for longer speech (dictation)
+    VOCAB_BIAS = 2.0
+
+    def __init__(self, model_size='base', model_dir=None, vocab=None, quantize=False,
+                 cache_path=None, mmap=True, short=False, max_tokens=SHORT_MAX_TOKENS,
+                 bias=VOCAB_BIAS, threads=0):
+        super().__init__(model_size, model_dir, vocab)
+        self.threads = threads
+        self.quantize = quantize
+        self.cache_path = cache_path
+        self.mmap = mmap
+        self.short = short
+        self.max_tokens = max_tokens
+        self.bias = bias
+        self._tokenizer = None
+        self._suppress = None
+        self._prefix = None
+        self._bias_sequences = []
+
+    def describe(self):
+        return (f"{self.name}:{self.model_size}" + (':int8' if self.quantize else '')
+                + (':short' if self.short else '') + ('+vocab' if self.vocab else ''))
+
+    def _boost(self, logits, text_tokens, bias_sequences):
+        """Favour tokens that continue a vocabulary entry (or end one)"""
+        n = len(text_tokens)
+        following = {seq[n] for seq in bias_sequences
+                     if len(seq) > n and list(seq[:n]) == text_tokens}
+        if following:
+            logits[list(following)] += self.bias
+
+    def load(self):
+        import torch
+
+        if self.threads and torch.get_num_threads() != self.threads:
+            torch.set_num_threads(self.threads)
+        key = self._cache_key() if self.quantize and self.cache_path else None
+        if key is not None and os.path.exists(self.cache_path) and self._cached_key() == key:
+            self.model = torch.load(self.cache_path, map_location='cpu', weights_only=False,
+                                    mmap=self.mmap)
+            return self
+
+        model = None
+        if self.mmap:
+            try:
+                model = self._load_mmap()
+            except Exception:
+                model = None    # older torch/whisper: fall back to a plain load
+        if model is None:
+            import whisper
+            model = whisper.load_model(self.model_size, device='cpu', download_root=self.model_dir)
+
+        if self.quantize:
+            model = self._quantize(model)
+            # the checkpoint may only have been downloaded just now
+            key = key or (self._cache_key() if self.cache_path else None)
+            if key is not None:
+                os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+                torch.save(model, self.cache_path)
+                with open(self.cache_path + '.json', 'w', encoding='utf-8') as f:
+                    json.dump(key, f)
+        self.model = model
+        return self
+
+    def _checkpoint_path(self):
+        import whisper
+        if self.model_size in whisper._MODELS:
+            root = self.model_dir or os.path.join(os.path.expanduser('~'), '.cache', 'whisper')
+            return os.path.join(root, os.path.basename(whisper._MODELS[self.model_size]))
+        return self.model_size      # load_model also takes a checkpoint path
+
+    def _cache_key(self):
+        """What a quantized cache is built from, or None if the checkpoint isn't there"""
+        import torch
+        import whisper
+        path = self._checkpoint_path()
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        return {'whisper': getattr(whisper, '__version__', None), 'torch': torch.__version__,
+                'checkpoint': os.path.abspath(path), 'size': stat.st_size,
+                'mtime': stat.st_mtime}
+
+    def _cached_key(self):
+        try:
+            with open(self.cache_path + '.json', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load_mmap(self):
+        import torch
+        import whisper
+        from whisper.model import ModelDimensions, Whisper
+
+        root = self.model_dir or os.path.join(os.path.expanduser('~'), '.cache', 'whisper')
+        path = whisper._download(whisper._MODELS[self.model_size], root, False)
+        checkpoint = torch.load(path, map_location='cpu', mmap=True, weights_only=True)
+        dims = ModelDimensions(**checkpoint['dims'])
+
+        # build without allocating weights, then assign the checkpoint tensors;
+        # whisper checkpoints are fp16 and CPU inference runs in fp32
+        try:
+            with torch.device('meta'):
+                model = Whisper(dims)
+        except Exception:
+            model = Whisper(dims)   # this torch can't build every buffer on meta
+        state = {k: v.float() if v.is_floating_point() else v
+                 for k, v in checkpoint['model_state_dict'].items()}
+        model.load_state_dict(state, assign=True)
+
+        # non-persistent buffers aren't in the checkpoint; rebuild them
+        model.decoder.register_buffer(
+            'mask', torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-float('inf')).triu_(1),
+            persistent=False)
+        if self.model_size in whisper._ALIGNMENT_HEADS:
+            model.set_alignment_heads(whisper._ALIGNMENT_HEADS[self.model_size])
+        else:
+            heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+            heads[dims.n_text_layer // 2:] = True
+            model.register_buffer('alignment_heads', heads.to_sparse(), persistent=False)
+
+        if any(t.is_meta for t in list(model.parameters()) + list(model.buffers())):
+            raise RuntimeError("model has unloaded tensors")
+        return model.eval()
+
+    @staticmethod
+    def _quantize(model):
+        import torch
+        from whisper.model import Linear
+
+        # whisper's Linear only adds a dtype cast in forward(); quantize_dynamic
+        # only converts exact nn.Linear instances, so treat them as such
+        for module in model.modules():
+            if type(module) is Linear:
+                module.__class__ = torch.nn.Linear
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def transcribe(self, audio, prompt=None):
+        if self.short and len(audio) <= self.SHORT_MAX_SECONDS * 16000:
+            return self._transcribe_short(audio, prompt)
+        if prompt is None:
+            prompt = self.prompt
+        # '' means no prompt; whisper would encode it as a " " prompt token
+        result = self.model.transcribe(audio, initial_prompt=prompt or None,
+                                       **self.DECODE_OPTIONS)
+        return result['text'].strip()
+
+    def _setup_short(self):
+        import torch
+        from whisper.tokenizer import get_tokenizer
+
+        model = self.model
+        try:
+            tokenizer = get_tokenizer(model.is_multilingual, num_languages=model.num_languages,
+                                      language='en', task='transcribe')
+        except TypeError:
+            tokenizer = get_tokenizer(model.is_multilingual, language='en', task='transcribe')
+
+        # text tokens and <|endoftext|> only: no timestamps, other specials or
+        # non-speech symbols (what transcribe() suppresses by default)
+        suppress = torch.zeros(model.dims.n_vocab, dtype=torch.bool)
+        suppress[tokenizer.eot + 1:] = True
+        suppress[list(tokenizer.non_speech_tokens)] = True
+        self._tokenizer, self._suppress = tokenizer, suppress
+
+        # same prompt layout as DecodingTask: <|startofprev|> prompt <|startoftranscript|>...
+        prefix = list(tokenizer.sot_sequence_including_notimestamps)
+        if self.vocab:
+            prompt = tokenizer.encode(" " + self.prompt)[-(model.dims.n_text_ctx // 2 - 1):]
+            prefix = [tokenizer.sot_prev] + prompt + prefix
+            if self.bias:
+                self._bias_sequences = [seq + (tokenizer.eot,)
+                                        for seq in self.vocab.token_sequences(tokenizer.encode)]
+        self._prefix = prefix
+
+    def _encode_short(self, mel):
+        """AudioEncoder.forward() without the 30 s shape check"""
+        import torch.nn.functional as F
+
+        encoder = self.model.encoder
+        x = F.gelu(encoder.conv1(mel))
+        x = F.gelu(encoder.conv2(x))
+        x = x.permute(0, 2, 1)
+        x = (x + encoder.positional_embedding[:x.shape[1]]).to(x.dtype)
+        for block in encoder.blocks:
+            x = block(x)
+        return encoder.ln_post(x)
+
+    def _transcribe_short(self, audio, prompt=None):
+        import torch
+        import whisper
+
+        if self._tokenizer is None:
+            self._setup_short()
+        tokenizer, model = self._tokenizer, self.model
+        prefix, bias_sequences = self._prefix, self._bias_sequences
+        max_tokens = self.max_tokens
+        if prompt is not None:
+            # per-call context instead of the vocabulary: no entry bias, and
+            # a token budget for running speech rather than a device name
+            prefix = list(tokenizer.sot_sequence_including_notimestamps)
+            if prompt:
+                context = tokenizer.encode(" " + prompt)[-(model.dims.n_text_ctx // 2 - 1):]
+                prefix = [tokenizer.sot_prev] + context + prefix
+            bias_sequences = []
+            seconds = len(audio) / whisper.audio.SAMPLE_RATE
+            max_tokens = max(max_tokens, math.ceil(seconds * self.SHORT_TOKENS_PER_SECOND))
+
+        # whole-second window; 100 mel frames per second, so always even for conv2
+        bucket = self.SHORT_BUCKET_SECONDS * whisper.audio.SAMPLE_RATE
+        seconds = len(audio) / whisper.audio.SAMPLE_RATE + self.SHORT_PAD_SECONDS
+        n_samples = math.ceil(seconds * whisper.audio.SAMPLE_RATE / bucket) * bucket
+        audio = whisper.pad_or_trim(torch.from_numpy(audio).float(), n_samples)
+        mel = whisper.log_mel_spectrogram(audio, n_mels=model.dims.n_mels).unsqueeze(0)
+
+        cache, hooks = model.install_kv_cache_hooks()
+        try:
+            with torch.no_grad():
+                features = self._encode_short(mel)
+                step_tokens = torch.tensor([prefix])
+                text_tokens = []
+                for step in range(max_tokens):
+                    logits = model.decoder(step_tokens, features, kv_cache=cache)[0, -1]
+                    logits[self._suppress] = -math.inf
+                    if bias_sequences:
+                        self._boost(logits, text_tokens, bias_sequences)
+                    if step == 0:
+                        # don't let the transcript start blank (SuppressBlank)
+                        logits[tokenizer.encode(" ") + [tokenizer.eot]] = -math.inf
+                    token = int(logits.argmax())
+                    if token == tokenizer.eot:
+                        break
+                    text_tokens.append(token)
+                    step_tokens = torch.tensor([[token]])
+        finally:
+            for hook in hooks:
+                hook.remove()
+        return tokenizer.decode(text_tokens).strip()
+
+
+class FasterWhisperBackend(ASRBackend):
+    """
+    CTranslate2 Whisper (faster-whisper) with int8 weights on CPU.
+
+    Loads a converted model from a local directory, e.g. one made with
+    `ct2-transformers-converter --model openai/whisper-base --quantization int8`.
+    Nothing is downloaded at runtime.
+    """
+
+    name = 'faster-whisper'
+
+    def __init__(self, model_size='base', model_dir=None, vocab=None, compute_type='int8',
+                 cpu_threads=0):
+        super().__init__(model_size, model_dir, vocab)
+        self.compute_type = compute_type
+        self.cpu_threads = cpu_threads
+
+    def load(self):
+        from faster_whisper import WhisperModel
+        if not self.model_dir or not os.path.isdir(self.model_dir):
+            raise FileNotFoundError(f"faster-whisper model directory not found: {self.model_dir}")
+        self.model = WhisperModel(
+            self.model_dir,
+            device='cpu',
+            compute_type=self.compute_type,
+            cpu_threads=self.cpu_threads,
+            local_files_only=True,
+        )
+        return self
+
+    def transcribe(self, audio, prompt=None):
+        segments, _ = self.model.transcribe(
+            audio,
+            language='en',
+            beam_size=1,
+            best_of=1,
+            temperature=0,
+            condition_on_previous_text=False,
+            without_timestamps=True,
+            initial_prompt=(self.prompt if prompt is None else prompt) or None,
+        )
+        # segments is a generator; decoding happens while we iterate
+        return "".join(segment.text for segment in segments).strip()
+
+
+def _serve_backend(conn, name, kwargs):
+    """Child process of ProcessBackend: load, then answer (audio, prompt) requests"""
+    try:
+        backend = create_backend(name, **kwargs).load()
+    except Exception as e:
+        conn.send(('error', f"{type(e).__name__}: {e}"))
+        return
+    conn.send(('ready', None))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        try:
+            conn.send(('ok', backend.transcribe(*request)))
+        except Exception as e:
+            conn.send(('error', f"{type(e).__name__}: {e}"))
+
+
+class ProcessBackend(ASRBackend):
+    """
+    A backend (by name and constructor arguments) running in its own
+    process, spawned on load(). transcribe() sends the audio over a pipe
+    and waits for the text, so each instance still serves one caller at a
+    time; use one per worker.
+    """
+
+    def __init__(self, name, **kwargs):
+        super().__init__(kwargs.get('model_size', 'base'), kwargs.get('model_dir'),
+                         kwargs.get('vocab'))
+        self.name = name
+        self.kwargs = kwargs
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        """Spawn the child; load() then waits for it. Starting all first loads them in parallel."""
+        if self.process is None:
+            context = multiprocessing.get_context('spawn')
+            self.conn, child = context.Pipe()
+            self.process = context.Process(target=_serve_backend, name=f"asr-{self.name}",
+                                           args=(child, self.name, self.kwargs), daemon=True)
+            self.process.start()
+            child.close()
+
+    def load(self):
+        self.start()
+        self._reply()
+        return self
+
+    def transcribe(self, audio, prompt=None):
+        self.conn.send((audio, prompt))
+        return self._reply()
+
+    def _reply(self):
+        try:
+            status, value = self.conn.recv()
+        except EOFError:
+            raise RuntimeError(f"{self.name} worker process exited")
+        if status == 'error':
+            raise RuntimeError(value)
+        return value
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(timeout=2)
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process = None
+
+    def describe(self):
+        return create_backend(self.name, **self.kwargs).describe() + ':process'
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def create_backend(name, **kwargs):
+    try:
+        return BACKENDS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"unknown ASR backend '{name}' (choose from {', '.join(BACKENDS)})")
@@ -0,0 +1,156 @@
+"""
+Compare ASR backends on the same recorded clips.
+
+The clip directory holds 16 kHz mono 16-bit WAV files and a manifest.tsv
+with one `<file name><TAB><expected text>` line per clip. Each backend is
+given as name[:model size[:variant]]. For Whisper the variant is a
++-separated list of `int8` (quantized) and `short` (short-command fast
+path); for faster-whisper it is a CTranslate2 compute type:
+
+    python benchmark_asr.py --clips clips/ --backend whisper:base \
+        --backend whisper:base:short --backend whisper:base:int8+short \
+        --backend faster-whisper:base:int8 --model-dir models/faster-whisper-base
+
+Reports load time, resident memory after loading, real-time factor
+(decode time / audio time, lower is faster), word error rate and
+exact-match command accuracy. With --vocab the backends decode with the
+vocabulary prompt (and logit bias for whisper short variants), and
+`snap %` is the exact-match accuracy after snapping to the vocabulary;
+compare against a run without --vocab:
+
+    python benchmark_asr.py --clips clips/ --backend whisper:base:short
+    python benchmark_asr.py --clips clips/ --backend whisper:base:short --vocab commands.tsv
+
+Memory is per process, so give a single --backend per run when comparing
+RSS.
+"""
+
+import os
+import sys
+import time
+import resource
+import argparse
+import numpy as np
+
+from asr_backends import WhisperBackend, create_backend
+from vocabulary import Vocabulary, edit_distance, normalize
+from realtime_transcribe import SAMPLE_RATE, read_wav, warm_up
+
+
+def read_manifest(clip_dir):
+    clips = []
+    with open(os.path.join(clip_dir, 'manifest.tsv'), encoding='utf-8') as f:
+        for line in f:
+            if line.strip() and not line.startswith('#'):
+                name, text = line.rstrip('\n').split('\t', 1)
+                clips.append((os.path.join(clip_dir, name), text))
+    return clips
+
+
+def rss_mb():
+    """Current resident set size in MB (peak RSS if psutil is unavailable off Linux)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 2**20
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def make_backend(spec, args):
+    name, size, variant = (spec.split(':') + ['', ''])[:3]
+    vocab = Vocabulary.load(args.vocab) if args.vocab else None
+    kwargs = dict(model_size=size or 'base', model_dir=args.model_dir, vocab=vocab)
+    if name == 'whisper':
+        flags = set(variant.split('+')) - {''}
+        if flags - {'int8', 'short'}:
+            raise ValueError(f"unknown whisper variant '{variant}'")
+        kwargs.update(model_dir=None, quantize='int8' in flags, cache_path=args.quantized_cache,
+                      mmap=not args.no_mmap, short='short' in flags, max_tokens=args.max_tokens,
+                      bias=args.vocab_bias)
+    elif variant:
+        kwargs.update(compute_type=variant)
+    return create_backend(name, **kwargs)
+
+
+def run_backend(spec, clips, args):
+    backend = make_backend(spec, args)
+
+    rss_before = rss_mb()
+    t0 = time.perf_counter()
+    backend.load()
+    load_time = time.perf_counter() - t0
+    rss_loaded = rss_mb() - rss_before
+    warm_up(backend.transcribe, args.warmup_runs)
+
+    audio_time = decode_time = 0.0
+    errors = words = exact = snapped = 0
+    for path, expected in clips:
+        audio = read_wav(path).astype(np.float32) / 32768.0
+        t0 = time.perf_counter()
+        text = backend.transcribe(audio)
+        decode_time += time.perf_counter() - t0
+        audio_time += len(audio) / SAMPLE_RATE
+
+        ref, hyp = normalize(expected).split(), normalize(text).split()
+        errors += edit_distance(ref, hyp)
+        words += len(ref)
+        exact += ref == hyp
+        if backend.vocab is not None:
+            snapped += normalize(backend.vocab.snap(text)).split() == ref
+        if args.verbose:
+            print(f"  {os.path.basename(path)}: {text!r}", file=sys.stderr)
+
+    row = {
+        'backend': backend.describe(),
+        'load s': load_time,
+        'RSS MB': rss_loaded,
+        'RTF': decode_time / audio_time,
+        'ms/clip': decode_time / len(clips) * 1000,
+        'WER %': errors / max(words, 1) * 100,
+        'exact %': exact / len(clips) * 100,
+    }
+    if backend.vocab is not None:
+        row['snap %'] = snapped / len(clips) * 100
+    return row
+
+
+def print_table(rows):
+    columns = list(rows[0])
+    print("  ".join(f"{c:>12}" if i else f"{c:<24}" for i, c in enumerate(columns)))
+    for row in rows:
+        print("  ".join(
+            f"{row[c]:>12.3f}" if isinstance(row[c], float) else f"{row[c]:<24}"
+            for c in columns))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ASR backends on recorded clips')
+    parser.add_argument('--clips', required=True, help='Directory with WAV files and manifest.tsv')
+    parser.add_argument('--backend', action='append', default=[],
+                        help='name[:size[:variant]], repeatable (default whisper:base)')
+    parser.add_argument('--model-dir', help='Local model directory for faster-whisper')
+    parser.add_argument('--quantized-cache', help='Cache file for whisper int8 (default: none)')
+    parser.add_argument('--no-mmap', action='store_true', help='Load whisper weights without mmap')
+    parser.add_argument('--max-tokens', type=int, default=WhisperBackend.SHORT_MAX_TOKENS,
+                        help='Token budget for whisper short variants')
+    parser.add_argument('--vocab', help='Vocabulary file for prompting, biasing and snapping')
+    parser.add_argument('--vocab-bias', type=float, default=WhisperBackend.VOCAB_BIAS,
+                        help='Logit boost for whisper short variants (0 = prompt only)')
+    parser.add_argument('--warmup-runs', type=int, default=1)
+    parser.add_argument('--verbose', action='store_true', help='Print every transcription')
+    args = parser.parse_args()
+
+    clips = read_manifest(args.clips)
+    rows = [run_backend(spec, clips, args) for spec in args.backend or ['whisper:base']]
+    print(f"{len(clips)} clips")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Startup benchmark for the transcriber.
+
+Measures the import cost of each dependency in a fresh interpreter
+(python -X importtime) and the wall-clock time of `--list-devices`,
+either from source or against a PyInstaller build:
+
+    python benchmark_imports.py
+    python benchmark_imports.py --exe dist/whisper_transcriber/whisper_transcriber
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+MODULES = ['pyaudio', 'numpy', 'pocketsphinx', 'torch', 'whisper']
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_time(module):
+    """Cumulative import time of module in seconds, or None if it is not installed"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        return None
+    # lines look like "import time:  self [us] | cumulative | imported package"
+    for line in proc.stderr.splitlines():
+        parts = [p.strip() for p in line.split('|')]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1e6
+    return None
+
+
+def time_command(cmd, runs):
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, capture_output=True, cwd=HERE)
+        times.append(time.perf_counter() - t0)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure transcriber startup cost')
+    parser.add_argument('--exe', help='Time this built executable instead of the source script')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    print("Import time (fresh interpreter, cumulative):")
+    for module in MODULES:
+        t = import_time(module)
+        print(f"  {module:<14}" + ("not installed" if t is None else f"{t * 1000:8.0f} ms"))
+
+    if args.exe:
+        cmd = [os.path.abspath(args.exe), '--list-devices']
+    else:
+        cmd = [sys.executable, os.path.join(HERE, 'realtime_transcribe.py'), '--list-devices']
+    times = time_command(cmd, args.runs)
+    print(f"\n--list-devices ({'build' if args.exe else 'source'}, {args.runs} runs):")
+    print(f"  min {min(times) * 1000:.0f} ms, max {max(times) * 1000:.0f} ms, "
+          f"first {times[0] * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Offline benchmark and regression suite for the whole voice pipeline.
+
+Streams recorded clips through realtime_transcribe.py (or a build) with
+--input-wav, so it needs no audio hardware, and reads the protocol and
+STATUS lines it prints. The clip directory holds 16 kHz mono 16-bit WAV
+files and a manifest.tsv with one line per clip:
+
+    hey_max_reverb.wav<TAB>reverb            wake word, then a command
+    kitchen_noise.wav<TAB>-                  negative: no wake word
+
+Reports, per run:
+- wake false rejects (positives without a detection) and false accepts
+  (detections in negatives, extra detections in positives), also per
+  hour of negative audio
+- wake latency, as measured by the transcriber
+- command accuracy and end-of-speech -> result latency, for the command
+  spotter (COMMAND:) and Whisper (TRANSCRIPTION:) paths
+- real-time factor: processing wall time / streamed audio
+
+Clips are streamed as fast as the pipeline keeps up by default; latencies
+are then compute time only. Pass --realtime for user-facing latencies.
+Arguments after `--` go to the transcriber:
+
+    python benchmark_pipeline.py --clips clips/ -- --short-commands --vocab commands.tsv
+    python benchmark_pipeline.py --clips clips/ --save base.json
+    python benchmark_pipeline.py --clips clips/ --baseline base.json   # exit 1 on regression
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import wave
+import argparse
+import subprocess
+import numpy as np
+
+from vocabulary import normalize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INPUT_GAP_SECONDS = 2
+
+# metric -> True if higher is better, for --baseline
+REGRESSION_METRICS = {
+    'false reject %': False,
+    'false accepts / h': False,
+    'command accuracy %': True,
+    'wake latency p95 ms': False,
+    'result latency p95 ms': False,
+    'RTF': False,
+}
+
+INPUT_RE = re.compile(r"STATUS: Input (\d+)/\d+ .+ at \d+$")
+WAKE_LATENCY_RE = re.compile(r"STATUS: Wake latency (\d+) ms$")
+COMMAND_LATENCY_RE = re.compile(r"STATUS: Command '.*' after (\d+) ms$")
+WHISPER_LATENCY_RE = re.compile(r"STATUS: Transcription (\d+) ms after speech end$")
+
+
+def read_manifest(clip_dir):
+    """[(path, expected command or None for negatives)]"""
+    clips = []
+    with open(os.path.join(clip_dir, 'manifest.tsv'), encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            name, _, expected = line.rstrip('\n').partition('\t')
+            expected = expected.strip()
+            clips.append((os.path.join(clip_dir, name),
+                          None if expected in ('', '-') else expected))
+    return clips
+
+
+def wav_seconds(path):
+    with wave.open(path, 'rb') as wav:
+        return wav.getnframes() / wav.getframerate()
+
+
+def run_pipeline(cmd):
+    """Run the transcriber; returns {clip index in the manifest: events} and timing"""
+    env = dict(os.environ, PYTHONUNBUFFERED='1')
+    proc = subprocess.Popen(cmd, cwd=HERE, env=env, text=True,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    clips, current = {}, None
+    t_start = t_end = None
+    for line in proc.stdout:
+        now = time.monotonic()
+        line = line.strip().lstrip('.')     # activity dots have no newline
+        match = INPUT_RE.match(line)
+        if match:
+            if t_start is None:
+                t_start = now
+            current = clips.setdefault(int(match.group(1)) - 1, {
+                'wakes': 0, 'wake_ms': [], 'results': [], 'result_ms': []})
+            continue
+        if line == "STATUS: Input finished":
+            t_end = now
+        if line.startswith("ERROR:"):
+            print(line, file=sys.stderr)
+        if current is None:
+            continue
+
+        if "Wake word detected" in line:
+            current['wakes'] += 1
+        elif line.startswith("COMMAND:"):
+            current['results'].append(('kws', line[8:].split(' ', 1)[1]))
+        elif line.startswith("TRANSCRIPTION:"):
+            current['results'].append(('whisper', line[14:].strip()))
+        for pattern, key in ((WAKE_LATENCY_RE, 'wake_ms'), (COMMAND_LATENCY_RE, 'result_ms'),
+                             (WHISPER_LATENCY_RE, 'result_ms')):
+            match = pattern.match(line)
+            if match:
+                current[key].append(int(match.group(1)))
+    proc.wait()
+    return clips, t_start, t_end or time.monotonic(), proc.returncode
+
+
+def p95(values):
+    return float(np.percentile(values, 95)) if values else float('nan')
+
+
+def summarize(clips, events, audio_seconds, wall_seconds):
+    # clips are keyed by their index: names can repeat across subdirectories
+    positives = [(i, e) for i, (_, e) in enumerate(clips) if e is not None]
+    negatives = [(i, e) for i, (_, e) in enumerate(clips) if e is None]
+    negative_hours = sum(wav_seconds(p) for p, e in clips if e is None) / 3600
+    empty = {'wakes': 0, 'wake_ms': [], 'results': [], 'result_ms': []}
+
+    misses = false_accepts = correct = 0
+    paths = {'kws': 0, 'whisper': 0}
+    wake_ms, result_ms = [], []
+    for index, expected in positives:
+        ev = events.get(index, empty)
+        misses += ev['wakes'] == 0
+        false_accepts += max(0, ev['wakes'] - 1)
+        if ev['results']:
+            path, text = ev['results'][0]
+            paths[path] += 1
+            correct += normalize(text) == normalize(expected)
+        wake_ms += ev['wake_ms']
+        result_ms += ev['result_ms']
+    for index, _ in negatives:
+        false_accepts += events.get(index, empty)['wakes']
+
+    return {
+        'positives': len(positives),
+        'negatives': len(negatives),
+        'false reject %': misses / max(len(positives), 1) * 100,
+        'false accepts': false_accepts,
+        'false accepts / h': false_accepts / negative_hours if negative_hours else float('nan'),
+        'command accuracy %': correct / max(len(positives), 1) * 100,
+        'via command spotter': paths['kws'],
+        'via whisper': paths['whisper'],
+        'wake latency p95 ms': p95(wake_ms),
+        'result latency mean ms': float(np.mean(result_ms)) if result_ms else float('nan'),
+        'result latency p95 ms': p95(result_ms),
+        'RTF': wall_seconds / audio_seconds,
+    }
+
+
+def compare(metrics, baseline, tolerance):
+    """Names of metrics that got worse than baseline by more than tolerance"""
+    worse = []
+    for name, higher_is_better in REGRESSION_METRICS.items():
+        new, old = metrics.get(name), baseline.get(name)
+        if new is None or old is None or new != new or old != old:    # missing or NaN
+            continue
+        margin = max(abs(old) * tolerance, 1e-9)
+        if (old - new if higher_is_better else new - old) > margin:
+            worse.append(f"{name}: {old:.2f} -> {new:.2f}")
+    return worse
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the voice pipeline on recorded clips')
+    parser.add_argument('--clips', required=True, help='Directory with WAV files and manifest.tsv')
+    parser.add_argument('--exe', help='Run this built transcriber instead of the source script')
+    parser.add_argument('--realtime', action='store_true', help='Stream clips at real-time speed')
+    parser.add_argument('--input-gap', type=float, default=INPUT_GAP_SECONDS,
+                        help='Seconds of silence after each clip')
+    parser.add_argument('--save', help='Write the metrics to this JSON file')
+    parser.add_argument('--baseline', help='Compare against saved metrics; exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative change before a metric counts as a regression')
+    parser.add_argument('transcriber_args', nargs=argparse.REMAINDER,
+                        help='Arguments for the transcriber, after --')
+    args = parser.parse_args()
+    if '--jsonl' in args.transcriber_args:
+        parser.error("--jsonl can't be passed to the transcriber: the benchmark reads the line protocol")
+
+    clips = read_manifest(args.clips)
+    if args.exe:
+        cmd = [os.path.abspath(args.exe)]
+    else:
+        cmd = [sys.executable, os.path.join(HERE, 'realtime_transcribe.py')]
+    for path, _ in clips:
+        cmd += ['--input-wav', os.path.abspath(path)]
+    cmd += ['--input-gap', str(args.input_gap)] + (['--realtime'] if args.realtime else [])
+    cmd += [a for a in args.transcriber_args if a != '--']
+
+    events, t_start, t_end, code = run_pipeline(cmd)
+    if t_start is None:
+        sys.exit(f"transcriber exited (code {code}) before streaming any input")
+    audio_seconds = sum(wav_seconds(p) + args.input_gap for p, _ in clips)
+    metrics = summarize(clips, events, audio_seconds, t_end - t_start)
+
+    print(f"{len(clips)} clips, {audio_seconds:.0f} s of audio, "
+          f"{'real time' if args.realtime else 'as fast as possible'}")
+    for name, value in metrics.items():
+        print(f"  {name:<24}{value:>10.2f}" if isinstance(value, float) else f"  {name:<24}{value:>10}")
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            worse = compare(metrics, json.load(f), args.tolerance)
+        for line in worse:
+            print(f"REGRESSION {line}")
+        if worse:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
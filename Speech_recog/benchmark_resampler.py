@@ -0,0 +1,99 @@
+"""
+CPU benchmark for capture-side format conversion (resampler.py).
+
+Converts blocks of noise the way the capture callback does, at the
+capture chunk sizes: a chunk of N samples at 16 kHz is a block of
+N * rate / 16000 frames at the device rate. For each rate, channel
+count and chunk size it reports the time per block and the share of one
+core that takes in real time. For comparison, the naive version
+(zero-stuff, full-length FIR, decimate) is timed on the same block. The
+alias column is the level of a 12 kHz tone after conversion; it should
+be far below 0 dB.
+
+    python benchmark_resampler.py
+    python benchmark_resampler.py --rates 44100,48000 --channels 2 --chunk-sizes 512
+"""
+
+import time
+import argparse
+import numpy as np
+
+from resampler import InputConverter, design_filter
+from realtime_transcribe import CHUNK_SIZE, SAMPLE_RATE
+
+
+def time_blocks(process, blocks, repeats):
+    """Best mean time per block over `repeats` passes, in seconds"""
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for block in blocks:
+            process(block)
+        best = min(best, (time.perf_counter() - t0) / len(blocks))
+    return best
+
+
+def naive(converter):
+    """Zero-stuff, filter with the whole prototype, decimate: what polyphase avoids"""
+    r = converter.resampler
+    h = design_filter(r.up, r.down, r.taps).astype(np.float32)
+
+    def process(block):
+        mono = block.reshape(-1, converter.channels).mean(axis=1, dtype=np.float32)
+        stuffed = np.zeros(len(mono) * r.up, dtype=np.float32)
+        stuffed[::r.up] = mono
+        return np.convolve(stuffed, h)[::r.down]
+    return process
+
+
+def alias_db(rate, tone=12000):
+    """Level of a full-scale tone above 8 kHz after conversion, in dB"""
+    if tone >= rate / 2:
+        return float('nan')
+    t = np.arange(rate) / rate
+    x = np.rint(np.sin(2 * np.pi * tone * t) * 16000).astype(np.int16)
+    y = InputConverter(rate, 1, SAMPLE_RATE).process(x).astype(np.float64)
+    rms = np.sqrt(np.mean(y[len(y) // 4:] ** 2))
+    return 20 * np.log10(max(rms, 1e-9) / (16000 / np.sqrt(2)))
+
+
+def parse_list(spec):
+    return [int(v) for v in spec.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark capture resampling and downmix')
+    parser.add_argument('--rates', default='22050,44100,48000,96000',
+                        help='Device sample rates to convert from')
+    parser.add_argument('--channels', default='1,2,8', help='Device channel counts')
+    parser.add_argument('--chunk-sizes', default=f'256,{CHUNK_SIZE},1024',
+                        help=f'Capture chunk sizes in samples at {SAMPLE_RATE} Hz')
+    parser.add_argument('--blocks', type=int, default=200, help='Blocks per timing pass')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rate':>6} {'ch':>3} {'chunk':>6} {'frames':>7} {'taps':>5} "
+          f"{'us/block':>9} {'% core':>7} {'naive us':>9} {'speedup':>8} {'alias dB':>9}")
+    for rate in parse_list(args.rates):
+        alias = alias_db(rate)
+        for channels in parse_list(args.channels):
+            for chunk in parse_list(args.chunk_sizes):
+                frames = max(1, round(chunk * rate / SAMPLE_RATE))
+                blocks = [rng.integers(-3000, 3000, frames * channels, dtype=np.int16)
+                          for _ in range(args.blocks)]
+                converter = InputConverter(rate, channels, SAMPLE_RATE)
+                per_block = time_blocks(converter.process, blocks, args.repeats)
+                core = per_block / (frames / rate) * 100
+                taps = converter.resampler.taps if converter.resampler else 0
+                if converter.resampler is not None:
+                    slow = time_blocks(naive(converter), blocks[:20], 1)
+                    compare = f"{slow * 1e6:9.0f} {slow / per_block:7.1f}x"
+                else:
+                    compare = f"{'-':>9} {'-':>8}"
+                print(f"{rate:>6} {channels:>3} {chunk:>6} {frames:>7} {taps:>5} "
+                      f"{per_block * 1e6:9.1f} {core:7.3f} {compare} {alias:9.1f}")
+
+
+if __name__ == "__main__":
+    main()
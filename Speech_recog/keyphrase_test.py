@@ -15,14 +15,17 @@ def get_resource_path(relative_path):
 
 print("=== Testing Keyphrase Detection ===")
 
-# Test keyphrase detection (simpler than keywords file)
+# Test keyphrase detection (simpler than keywords file), with the phrase
+# and threshold of the keywords file (chosen by tune_kws_threshold.py)
 try:
     print("Creating keyphrase config...")
+    with open(get_resource_path('keywords.kws'), encoding='utf-8') as f:
+        phrase, threshold = f.readline().split('/')[:2]
     config = Config(
         hmm=get_resource_path('en-us'),
         dict=get_resource_path('dictionary.dict'),
-        keyphrase='hey max',
-        kws_threshold=1e-1  # Very relaxed threshold
+        keyphrase=phrase.strip(),
+        kws_threshold=float(threshold)
     )
     
     decoder = Decoder(config)
@@ -0,0 +1,167 @@
+"""
+Generate the command vocabulary from DeviceLoader's program table.
+
+DeviceLoader.program_to_device is the closed set of things a voice command
+can ask for. This reads it (with ast, since DeviceLoader.py only imports
+inside Ableton) and writes three files next to the transcriber:
+
+    commands.tsv    <program><TAB><device name><TAB><spoken phrase>
+    commands.kws    PocketSphinx keyphrase list, one /threshold/ per phrase
+    commands.dict   pronunciations for every word in the phrases
+
+Pronunciations come from the CMU dictionary that ships with pocketsphinx.
+Words it doesn't know are split into two known words (wave + table), spelt
+out if they are short acronyms (EQ), or taken from EXTRA_PRONUNCIATIONS.
+Commands that still can't be pronounced are left out and reported.
+
+    python make_command_vocab.py
+    python make_command_vocab.py --device-loader ../DeviceLoader/DeviceLoader.py
+
+Rerun it whenever the program table changes.
+"""
+
+import os
+import ast
+import sys
+import argparse
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEVICE_LOADER = os.path.join(HERE, '..', 'DeviceLoader', 'DeviceLoader.py')
+
+# Keyphrase thresholds: longer phrases need a smaller threshold to be
+# detected at all, short ones a larger one to avoid false hits.
+# threshold = 1e-<exponent>, exponent = PHONE_EXPONENT * (phones - BASE_PHONES)
+# PHONE_EXPONENT is a starting point; tune it on recordings with
+# tune_kws_threshold.py --commands.
+PHONE_EXPONENT = 2
+BASE_PHONES = 4
+
+# Ableton names the CMU dictionary doesn't have
+EXTRA_PRONUNCIATIONS = {
+    'arpeggiator': ['AA R P EH JH IY EY T ER'],
+    'flanger': ['F L AE N JH ER'],
+    'limiter': ['L IH M AH T ER', 'L IH M IH T ER'],
+    'phaser': ['F EY Z ER'],
+    'resonators': ['R EH Z AH N EY T ER Z'],
+    'saturator': ['S AE CH ER EY T ER'],
+    'vocoder': ['V OW K OW D ER'],
+}
+
+
+def read_program_table(path):
+    """{program: device name} from the `self.program_to_device = {...}` assignment"""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict):
+            for target in node.targets:
+                if isinstance(target, ast.Attribute) and target.attr == 'program_to_device':
+                    return ast.literal_eval(node.value)
+    raise ValueError(f"{path}: no program_to_device table found")
+
+
+def spoken_phrase(name):
+    """'EQ Eight' -> 'eq eight', '__GET_STATUS__' -> 'get status'"""
+    return ' '.join(name.strip('_').replace('_', ' ').lower().split())
+
+
+def read_cmudict(path):
+    pronunciations = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            word = parts[0].split('(')[0]
+            pronunciations.setdefault(word, []).append(' '.join(parts[1:]))
+    return pronunciations
+
+
+def pronounce(word, cmudict):
+    """List of phone strings for word, or None"""
+    if word in EXTRA_PRONUNCIATIONS:
+        return EXTRA_PRONUNCIATIONS[word]
+    if word in cmudict:
+        return cmudict[word]
+    # compound of two dictionary words: wavetable, multiband
+    for i in range(2, len(word) - 1):
+        head, tail = word[:i], word[i:]
+        if head in cmudict and tail in cmudict:
+            return [cmudict[head][0] + ' ' + cmudict[tail][0]]
+    # short acronym: spell it
+    if len(word) <= 4 and all(c in cmudict for c in word):
+        return [' '.join(cmudict[c][0] for c in word)]
+    return None
+
+
+def count_phones(phrase, pronunciations):
+    """Phones in phrase, using the first pronunciation of each distinct word"""
+    return sum(len(pronunciations[word][0].split()) for word in set(phrase.split()))
+
+
+def threshold_exponent(phones, phone_exponent=PHONE_EXPONENT, base_phones=BASE_PHONES):
+    """1e-N keyphrase threshold exponent for a phrase of `phones` phones"""
+    return max(1, round(phone_exponent * (phones - base_phones)))
+
+
+def write_kws(path, phrases):
+    """Keyphrase list from [(phrase, threshold exponent)]"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for phrase, exponent in phrases:
+            f.write(f"{phrase} /1e-{exponent}/\n")
+
+
+def default_cmudict():
+    try:
+        from pocketsphinx import get_model_path
+    except ImportError:
+        return None
+    return os.path.join(get_model_path(), 'en-us', 'cmudict-en-us.dict')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the voice command vocabulary')
+    parser.add_argument('--device-loader', default=DEVICE_LOADER, help='Path to DeviceLoader.py')
+    parser.add_argument('--cmudict', default=default_cmudict(),
+                        help='CMU pronouncing dictionary (default: the one in pocketsphinx)')
+    parser.add_argument('--out-dir', default=HERE)
+    parser.add_argument('--phone-exponent', type=float, default=PHONE_EXPONENT)
+    parser.add_argument('--base-phones', type=int, default=BASE_PHONES)
+    args = parser.parse_args()
+
+    if not args.cmudict or not os.path.exists(args.cmudict):
+        parser.error("CMU dictionary not found; install pocketsphinx or pass --cmudict")
+
+    table = read_program_table(args.device_loader)
+    cmudict = read_cmudict(args.cmudict)
+
+    commands, words, skipped = [], {}, []
+    for program, name in sorted(table.items()):
+        phrase = spoken_phrase(name)
+        prons = {word: pronounce(word, cmudict) for word in phrase.split()}
+        missing = [word for word, pron in prons.items() if pron is None]
+        if missing:
+            skipped.append(f"{name} ({', '.join(missing)})")
+            continue
+        words.update(prons)
+        exponent = threshold_exponent(count_phones(phrase, prons),
+                                      args.phone_exponent, args.base_phones)
+        commands.append((program, name, phrase, exponent))
+
+    with open(os.path.join(args.out_dir, 'commands.tsv'), 'w', encoding='utf-8') as f:
+        for program, name, phrase, _ in commands:
+            f.write(f"{program}\t{name}\t{phrase}\n")
+    write_kws(os.path.join(args.out_dir, 'commands.kws'),
+              [(phrase, exponent) for _, _, phrase, exponent in commands])
+    with open(os.path.join(args.out_dir, 'commands.dict'), 'w', encoding='utf-8') as f:
+        for word in sorted(words):
+            for i, pron in enumerate(words[word]):
+                f.write(f"{word if i == 0 else f'{word}({i + 1})'} {pron}\n")
+
+    print(f"{len(commands)} commands, {len(words)} words written to {args.out_dir}")
+    for entry in skipped:
+        print(f"  skipped {entry}: no pronunciation", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
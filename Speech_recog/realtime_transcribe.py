@@ -1,26 +1,84 @@
 import sys
 import os
-import pyaudio
+import time
+import queue
+import wave
+import threading
+import functools
+import collections
 import numpy as np
-import pocketsphinx
-from pocketsphinx import Decoder, Config
 import json
 import argparse
+import socketserver
+import multiprocessing
+from asr_backends import BACKENDS, ProcessBackend, WhisperBackend, create_backend
+from vocabulary import SNAP_DISTANCE, Vocabulary, normalize
+from resampler import InputConverter
 
-# Import whisper at module level but handle import errors gracefully
-try:
-    import whisper
-    WHISPER_AVAILABLE = True
-except ImportError:
-    WHISPER_AVAILABLE = False
-    whisper = None
+# Heavy imports are deferred so --list-devices starts fast: the ASR
+# backends import whisper/torch in load(), pocketsphinx is only needed to
+# listen, and pyaudio only for the microphone, so WAV input (--input-wav)
+# runs without PortAudio. Run benchmark_imports.py to check what startup costs.
 
 # --- USER CONFIGURATION ---
-RECORD_SECONDS = 3
+RECORD_SECONDS = 3          # fixed command window when VAD is off
 SAMPLE_RATE = 16000
-CHUNK_SIZE = 1024
+CHUNK_SIZE = 512            # 32 ms; the wake word is checked after every chunk
+VAD_SILENCE_SECONDS = 0.4   # trailing silence that ends a command
+MIN_RECORD_SECONDS = 0.3
+MAX_RECORD_SECONDS = 6
+NO_SPEECH_SECONDS = 2       # give up if nothing is said after the wake word
+VAD_FRAME_MS = 20
+VAD_MARGIN_DB = 10          # speech = this far above the noise floor
+WARMUP_RUNS = 2             # first run is the cold one; 0 skips warm-up
+WARMUP_SECONDS = 2
+COMMAND_WINDOW_SECONDS = 3  # command vocabulary spotting after the wake word
+GATE_MARGIN_DB = 6          # wake word decoding runs this far above the noise floor
+GATE_HANG_SECONDS = 1.0     # ...and keeps running this long after the last sound
+GATE_LOOKBACK_SECONDS = 0.3 # audio before an onset that is decoded anyway
+DICTATION_STEP_SECONDS = 1.0    # new audio between decodes of an open phrase
+DICTATION_PAUSE_SECONDS = 0.6   # silence that closes a dictated phrase
+DICTATION_MAX_SECONDS = 10      # longest window decoded at once
+DICTATION_OVERLAP_SECONDS = 1.0 # audio decoded again after a long phrase is cut
+DICTATION_CPU_BUDGET = 0.5      # decode time as a share of real time
+DICTATION_PROMPT_WORDS = 40     # dictated words passed on as context
+QUEUE_SIZE = 4              # utterances waiting for a transcription worker
+QUEUE_POLICY = 'drop-oldest'  # which utterance goes when the queue is full
+RING_SECONDS = 30      # audio history the consumers can fall behind by
+STATS_INTERVAL = 30    # seconds between capture health reports
+INPUT_GAP_SECONDS = 2  # silence streamed after each input file
+CONTROL_HOST = '127.0.0.1'  # --daemon control socket, local connections only
 # --- END CONFIGURATION ---
 
+_emit_lock = threading.Lock()
+_jsonl = False      # --jsonl: every event as one JSON object on stdout
+
+def emit(line, stream=None, event=None, **fields):
+    """
+    Print one protocol line and flush; safe to call from any thread.
+
+    In JSON-lines mode the line becomes {"event", "t", ...} on stdout
+    instead: `t` is time.monotonic(), `event` is given or taken from the
+    line's prefix (STATUS, ERROR, READY...), and the rest of the line is
+    the "message" unless the event is given explicitly with its fields.
+    """
+    if _jsonl:
+        prefix, sep, message = line.partition(':')
+        if not sep and line.isupper():
+            prefix, message = line, ''
+        record = {'event': event or prefix.strip().lower(), 't': round(time.monotonic(), 6)}
+        if event is None and message.strip():
+            record['message'] = message.strip()
+        record.update(fields)
+        line, stream = json.dumps(record), sys.stdout
+    with _emit_lock:
+        print(line, file=stream or sys.stdout, flush=True)
+
+def detail(line):
+    """Diagnostic line for the prefixed format only; JSON events carry it as fields"""
+    if not _jsonl:
+        emit(line, sys.stderr)
+
 # --- Get paths for PyInstaller ---
 def get_resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -30,196 +88,1654 @@ def get_resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-def list_audio_devices():
-    """List all available audio input devices - lightweight, no Whisper needed"""
+def scan_audio_devices(fresh=False):
+    """
+    Audio input devices as [{'index', 'name', 'channels', 'sample_rate'}];
+    raises if PortAudio fails. PortAudio only enumerates devices when it
+    is first initialized in a process, so while a capture stream holds it
+    open the list would be stale: fresh=True scans in a new process.
+    """
+    if fresh:
+        with multiprocessing.get_context('spawn').Pool(1) as pool:
+            return pool.apply(scan_audio_devices)
+
+    import pyaudio
+    p = pyaudio.PyAudio()
     try:
-        p = pyaudio.PyAudio()
         devices = []
-        
-        print("AVAILABLE AUDIO DEVICES:")
         for i in range(p.get_device_count()):
             info = p.get_device_info_by_index(i)
             if info['maxInputChannels'] > 0:  # Only input devices
-                device_info = {
+                devices.append({
                     'index': i,
                     'name': info['name'],
                     'channels': info['maxInputChannels'],
                     'sample_rate': int(info['defaultSampleRate'])
-                }
-                devices.append(device_info)
-                print(f"  {i}: {info['name']} ({info['maxInputChannels']} channels)")
-        
-        p.terminate()
-        print(f"DEVICES_JSON:{json.dumps(devices)}")
+                })
         return devices
-        
+    finally:
+        p.terminate()
+
+def list_audio_devices():
+    """List all available audio input devices - lightweight, no Whisper needed"""
+    try:
+        devices = scan_audio_devices()
     except Exception as e:
-        print(f"ERROR: Failed to list audio devices: {e}", file=sys.stderr)
+        emit(f"ERROR: Failed to list audio devices: {e}", sys.stderr)
+        return []
+
+    if not _jsonl:
+        print("AVAILABLE AUDIO DEVICES:")
+        for device in devices:
+            print(f"  {device['index']}: {device['name']} ({device['channels']} channels)")
+    emit(f"DEVICES_JSON:{json.dumps(devices)}", event='devices', devices=devices)
+    return devices
+
+class AudioRingBuffer:
+    """
+    Preallocated int16 ring holding the most recent audio.
+
+    Samples are addressed by their absolute index since capture started, so
+    each consumer keeps its own read position. A consumer that falls more
+    than `capacity` samples behind loses the overwritten audio; those
+    samples are counted in `dropped`. `overflows` counts PortAudio input
+    overflows reported by the capture callback. `consumed` is the furthest
+    position read so far, for sources that must not run ahead of the
+    readers.
+    """
+
+    def __init__(self, seconds=RING_SECONDS, rate=SAMPLE_RATE):
+        self.rate = rate
+        self.capacity = int(seconds * rate)
+        self.data = np.zeros(self.capacity, dtype=np.int16)
+        self.written = 0
+        self.write_time = None    # time.monotonic() when the newest sample arrived
+        self.overflows = 0
+        self.dropped = 0
+        self.consumed = 0
+        self._writes = collections.deque(maxlen=1024)   # (end position, arrival time)
+        self._cond = threading.Condition()
+
+    def write(self, samples, t=None):
+        with self._cond:
+            self.write_time = time.monotonic() if t is None else t
+            self._writes.append((self.written + len(samples), self.write_time))
+            n = len(samples)
+            if n > self.capacity:
+                self.written += n - self.capacity
+                samples = samples[-self.capacity:]
+                n = self.capacity
+            i = self.written % self.capacity
+            first = min(n, self.capacity - i)
+            self.data[i:i + first] = samples[:first]
+            self.data[:n - first] = samples[first:]
+            self.written += n
+            self._cond.notify_all()
+
+    def time_of(self, pos):
+        """
+        Approximate monotonic capture time of ring position pos: arrival of
+        the write that delivered it, less the audio after it in that write.
+        Right for a live stream and for files streamed faster than real time.
+        """
+        with self._cond:
+            end, t = self.written, self.write_time
+            for write_end, write_time in reversed(self._writes):
+                if write_end < pos:
+                    break
+                end, t = write_end, write_time
+        return t - (end - pos) / self.rate
+
+    def wait_consumed(self, pos, timeout=None):
+        """Wait until a reader has read up to pos"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.consumed >= pos, timeout)
+
+    def read(self, start, n, timeout=None):
+        """
+        Wait until samples [start, start + n) are captured and return
+        (start, samples). If part of that range was already overwritten,
+        start moves up to the oldest sample still held. None on timeout.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self.written >= start + n, timeout):
+                return None
+            oldest = self.written - self.capacity
+            if start < oldest:
+                self.dropped += oldest - start
+                start = oldest
+                n = min(n, self.written - start)
+            if start + n > self.consumed:
+                self.consumed = start + n
+                self._cond.notify_all()
+            i = start % self.capacity
+            if i + n <= self.capacity:
+                return start, self.data[i:i + n].copy()
+            return start, np.concatenate((self.data[i:], self.data[:i + n - self.capacity]))
+
+
+class AudioCapture:
+    """
+    Input stream in PortAudio callback mode, feeding an AudioRingBuffer.
+
+    The device is opened at its native rate (or `rate` if given), so
+    interfaces that only run at 44.1/48 kHz work and PortAudio doesn't
+    resample. Only the channels up to `channel` (0-based; the first one
+    is a mono stream) are opened and that one is used; channel=None opens
+    them all and averages them, which on a multi-input interface with one
+    mic lowers the speech level by the channel count. Blocks are
+    resampled to the ring's rate in the callback.
+    """
+
+    def __init__(self, ring, device_index=None, chunk_size=CHUNK_SIZE, rate=None, channel=0):
+        self.ring = ring
+        self.device_index = device_index
+        self.chunk_size = chunk_size
+        self.rate = rate
+        self.channel = channel
+        self.converter = None
+        self.pyaudio = None
+        self.p = None
+        self.stream = None
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        if status & self.pyaudio.paInputOverflow:
+            self.ring.overflows += 1
+        self.ring.write(self.converter.process(np.frombuffer(in_data, dtype=np.int16)))
+        return None, self.pyaudio.paContinue
+
+    def start(self):
+        import pyaudio
+        self.pyaudio = pyaudio
+        self.p = pyaudio.PyAudio()
+
+        # Use specified device or default, in its own format
+        if self.device_index is not None:
+            device_info = self.p.get_device_info_by_index(self.device_index)
+        else:
+            device_info = self.p.get_default_input_device_info()
+        rate = int(self.rate or device_info['defaultSampleRate'])
+        channels = int(device_info['maxInputChannels'])
+        if self.channel is not None:
+            if self.channel >= channels:
+                raise ValueError(f"input channel {self.channel + 1} out of range "
+                                 f"(device has {channels})")
+            channels = self.channel + 1
+        self.converter = InputConverter(rate, channels, self.ring.rate, self.channel)
+
+        stream_kwargs = {
+            'format': pyaudio.paInt16,
+            'channels': channels,
+            'rate': rate,
+            'input': True,
+            # same callback period as chunk_size samples at the ring's rate
+            'frames_per_buffer': max(1, round(self.chunk_size * rate / self.ring.rate)),
+            'stream_callback': self._callback,
+        }
+        if self.device_index is not None:
+            stream_kwargs['input_device_index'] = self.device_index
+        emit(f"STATUS: Using audio device: {device_info['name']} ({self.converter.describe()})",
+             sys.stderr)
+
+        self.stream = self.p.open(**stream_kwargs)
+        self.stream.start_stream()
+
+    def close(self):
+        try:
+            if self.stream is not None:
+                self.stream.stop_stream()
+                self.stream.close()
+            if self.p is not None:
+                self.p.terminate()
+        except:
+            pass
+
+    def exhausted(self):
+        return False
+
+
+def read_wav(path):
+    """int16 mono samples at SAMPLE_RATE from a 16-bit WAV file (downmixed and resampled)"""
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit samples")
+        rate, channels = wav.getframerate(), wav.getnchannels()
+        data = wav.readframes(wav.getnframes())
+    return InputConverter(rate, channels, SAMPLE_RATE).process(np.frombuffer(data, dtype=np.int16))
+
+
+class WavSource(threading.Thread):
+    """
+    Streams WAV files into an AudioRingBuffer in chunks, like AudioCapture
+    does from a microphone, so the whole pipeline runs without audio
+    hardware.
+
+    realtime: pace chunks at the sample rate. Otherwise go as fast as the
+    readers keep up: at most `lead` chunks ahead of the furthest read.
+    Each file is followed by `gap` seconds of silence. Before the next file
+    starts, `idle()` (if set) must return True, so every event of a file
+    is reported before the next file's "Input" line.
+    """
+
+    def __init__(self, ring, paths, chunk_size=CHUNK_SIZE, realtime=False,
+                 gap=INPUT_GAP_SECONDS, lead=4, wait_for=None):
+        super().__init__(name="wav-source", daemon=True)
+        self.ring = ring
+        self.paths = paths
+        self.chunk_size = chunk_size
+        self.realtime = realtime
+        self.gap = int(gap * ring.rate)
+        self.lead = lead * chunk_size
+        self.wait_for = wait_for    # Event to wait on before streaming (model loaded)
+        self.idle = None
+        self._stop = threading.Event()
+        self._done = threading.Event()
+
+    def start(self):
+        for path in self.paths:
+            if not os.path.exists(path):
+                raise FileNotFoundError(path)
+        super().start()
+
+    def run(self):
+        try:
+            if self.wait_for is not None:
+                self.wait_for.wait()
+            self._t0 = time.monotonic()
+            self._pos0 = self.ring.written
+            silence = np.zeros(self.chunk_size, dtype=np.int16)
+            for i, path in enumerate(self.paths, 1):
+                # keep the room quiet until the previous file is fully handled
+                while self.idle is not None:
+                    self.ring.wait_consumed(self.ring.written, 0.1)
+                    if self.idle():
+                        break
+                    if not self._stream(silence):
+                        return
+                emit(f"STATUS: Input {i}/{len(self.paths)} {os.path.basename(path)} "
+                     f"at {self.ring.written}", sys.stderr, event='input',
+                     file=os.path.basename(path), index=i, pos=self.ring.written)
+                audio = read_wav(path)
+                # whole chunks only, so readers never wait on a partial one
+                pad = self.gap + -(len(audio) + self.gap) % self.chunk_size
+                if not self._stream(np.concatenate((audio, np.zeros(pad, dtype=np.int16)))):
+                    return
+            emit("STATUS: Input finished", sys.stderr)
+        except Exception as e:
+            emit(f"ERROR: Input failed: {e}", sys.stderr)
+        finally:
+            self._done.set()
+
+    def _stream(self, samples):
+        """Write samples chunk by chunk at the configured pace; False once closed"""
+        for j in range(0, len(samples), self.chunk_size):
+            if self.realtime:
+                delay = (self._t0 + (self.ring.written - self._pos0) / self.ring.rate
+                         - time.monotonic())
+                if delay > 0 and self._stop.wait(delay):
+                    return False
+            else:
+                while not self.ring.wait_consumed(self.ring.written - self.lead, 0.1):
+                    if self._stop.is_set():
+                        return False
+            if self._stop.is_set():
+                return False
+            self.ring.write(samples[j:j + self.chunk_size])
+        return True
+
+    def close(self):
+        self._stop.set()
+
+    def exhausted(self):
+        return self._done.is_set()
+
+
+class Utterance:
+    """A recorded command waiting for transcription"""
+
+    def __init__(self, audio, start, t_end=None):
+        self.audio = audio          # int16 samples, copied out of the ring
+        self.start = start          # ring position of the first sample
+        self.t_end = t_end          # capture time of the end of speech
+        self.t_queued = time.monotonic()
+        self.seq = None             # submission order, set by TranscriptionPool.submit
+
+
+class ModelLoader(threading.Thread):
+    """Runs load() in the background; `ready` is set once it finished or failed"""
+
+    def __init__(self, name, load):
+        super().__init__(name=f"load-{name}", daemon=True)
+        self.component = name
+        self.load = load
+        self.model = None
+        self.error = None
+        self.ready = threading.Event()
+
+    def run(self):
+        t0 = time.monotonic()
+        try:
+            self.model = self.load()
+            load_time = time.monotonic() - t0
+            detail(f"STATUS: {self.component} loaded in {load_time:.1f}s")
+            emit(f"READY:{self.component}", event='ready', component=self.component,
+                 load_s=round(load_time, 3))
+        except Exception as e:
+            self.error = e
+            emit(f"ERROR: Failed to load {self.component}: {e}", sys.stderr)
+        self.ready.set()
+
+
+class TranscriptionWorker(threading.Thread):
+    """One thread of a TranscriptionPool, decoding with its own backend"""
+
+    def __init__(self, pool, index):
+        super().__init__(name=f"transcriber-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+
+    def run(self):
+        pool, loader = self.pool, self.pool.loader
+        # take no job before the model is there: until then utterances wait
+        # in the queue, so its size is the real capacity and drops are counted
+        loader.ready.wait()
+        while True:
+            utterance = pool.jobs.get()
+            if loader.error is not None:
+                pool.release(utterance.seq, None)
+                pool.jobs.task_done()
+                continue
+            try:
+                audio_float = utterance.audio.astype(np.float32) / 32768.0
+
+                emit("STATUS: Transcribing...")
+                t0 = time.monotonic()
+                transcription = pool.transcribe(loader.model[self.index], audio_float)
+                done = time.monotonic()
+                pool.release(utterance.seq, functools.partial(
+                    self.publish, utterance, transcription, t0, done))
+            except Exception as e:
+                pool.release(utterance.seq, functools.partial(self.failed, e))
+            pool.jobs.task_done()
+
+    def publish(self, utterance, transcription, t0, done):
+        pool = self.pool
+        audio_s = len(utterance.audio) / SAMPLE_RATE
+        timing = dict(seq=utterance.seq, start_s=round(utterance.start / SAMPLE_RATE, 3),
+                      audio_s=round(audio_s, 3),
+                      queue_ms=round((t0 - utterance.t_queued) * 1000, 1),
+                      decode_ms=round((done - t0) * 1000, 1),
+                      rtf=round((done - t0) / max(audio_s, 1e-9), 3))
+        pool.waits.append(t0 - utterance.t_queued)
+        if len(pool.workers) > 1:
+            timing['worker'] = self.index
+        if utterance.t_end is not None:
+            latency = time.monotonic() - utterance.t_end
+            pool.latencies.append(latency)
+            timing['latency_ms'] = round(latency * 1000, 1)
+        if transcription:
+            emit(f"TRANSCRIPTION:{transcription}", event='transcription',
+                 text=transcription, **timing)
+        elif _jsonl:
+            emit("", event='transcription', text='', **timing)
+        if utterance.t_end is not None:
+            detail(f"STATUS: Transcription {latency * 1000:.0f} ms after speech end")
+        emit("STATUS: Listening for 'Hey Max'...")
+
+    def failed(self, error):
+        emit(f"ERROR: Transcription failed: {error}", sys.stderr)
+        emit("STATUS: Listening for 'Hey Max'...")
+
+
+class TranscriptionPool:
+    """
+    Transcribes queued utterances while capture and wake word spotting go on.
+
+    Jobs are Utterances on a queue of at most `max_queue`, served by one
+    TranscriptionWorker per backend in loader.model (a list, filled once
+    `loader` is done). Until then jobs wait with their audio, so wake words
+    spoken during startup still get transcribed. When utterances come in
+    faster than they are decoded and the queue is full, `policy` drops the
+    oldest waiting one (the newest command is what the user wants now) or
+    the new one; either way it is reported, never lost silently.
+
+    Results are released in submission order: a worker that finishes
+    early holds its result until every earlier utterance is reported or
+    dropped, so commands are applied in the order they were spoken.
+    Events carry the utterance's `seq` and `start_s` (stream time).
+    """
+
+    POLICIES = ('drop-oldest', 'drop-newest')
+
+    def __init__(self, loader, transcribe, size=1, max_queue=QUEUE_SIZE, policy=QUEUE_POLICY):
+        if policy not in self.POLICIES:
+            raise ValueError(f"unknown queue policy '{policy}'")
+        self.loader = loader
+        self.transcribe = transcribe    # (backend, float32 audio) -> text
+        self.jobs = queue.Queue(max_queue)
+        self.policy = policy
+        self.latencies = []         # end of speech -> result, seconds
+        self.waits = []             # time in the queue, seconds
+        self.depths = []            # queue depth seen by each new utterance
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        self._next_release = 0
+        self._finished = {}         # seq -> publish callable, None if dropped
+        self._release_lock = threading.Lock()
+        self.workers = [TranscriptionWorker(self, i) for i in range(size)]
+
+    def start(self):
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, utterance):
+        """Queue an utterance; returns the queue depth it found"""
+        with self._lock:
+            depth = self.jobs.qsize()
+            self.depths.append(depth)
+            if self.jobs.full():
+                self.dropped += 1
+                if self.policy == 'drop-newest':
+                    emit("STATUS: Transcription queue full; dropped the new utterance",
+                         sys.stderr, event='dropped', policy=self.policy, depth=depth)
+                    return depth
+                try:
+                    oldest = self.jobs.get_nowait()
+                    self.jobs.task_done()
+                    self.release(oldest.seq, None)
+                    emit("STATUS: Transcription queue full; dropped the oldest utterance",
+                         sys.stderr, event='dropped', policy=self.policy, depth=depth,
+                         seq=oldest.seq)
+                except queue.Empty:
+                    pass        # a worker took it meanwhile
+            utterance.seq = self._next_seq
+            self._next_seq += 1
+            self.jobs.put_nowait(utterance)
+            if not self.loader.ready.is_set():
+                emit("STATUS: Waiting for Whisper model...")
+            return depth
+
+    def release(self, seq, publish):
+        """Run `publish` for utterance `seq` (None: nothing to report) once all earlier ones are out"""
+        with self._release_lock:
+            self._finished[seq] = publish
+            while self._next_release in self._finished:
+                publish = self._finished.pop(self._next_release)
+                self._next_release += 1
+                if publish is not None:
+                    publish()
+
+    def report(self):
+        if not self.depths:
+            return f"{len(self.workers)} worker(s), no utterances"
+        return (f"{len(self.workers)} worker(s), {len(self.depths)} utterances, "
+                f"depth mean {np.mean(self.depths):.1f} max {max(self.depths)}/{self.jobs.maxsize}, "
+                f"wait {summarize_ms(self.waits)}, dropped {self.dropped} ({self.policy})")
+
+
+class EnergyVAD:
+    """
+    Frame-level voice activity from energy and zero-crossing rate.
+
+    A frame is speech when its level is VAD_MARGIN_DB above an adaptive
+    noise floor, or half that margin with a high zero-crossing rate (quiet
+    fricatives like "s" and "f"). The floor follows quiet frames quickly
+    and loud ones very slowly, so it settles on the background level.
+    """
+
+    def __init__(self, rate=SAMPLE_RATE, frame_ms=VAD_FRAME_MS, margin_db=VAD_MARGIN_DB,
+                 zcr_threshold=0.25, min_db=-60.0):
+        self.frame = int(rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.zcr_threshold = zcr_threshold
+        self.min_db = min_db
+        self.noise_db = -50.0
+        self._rest = np.zeros(0, dtype=np.int16)
+
+    def frames(self, samples):
+        """Return per-frame speech flags for samples, carrying the leftover over"""
+        x = np.concatenate((self._rest, samples))
+        n = len(x) // self.frame
+        self._rest = x[n * self.frame:]
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+
+        frames = x[:n * self.frame].reshape(n, self.frame).astype(np.float32) / 32768.0
+        db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        zcr = np.mean(np.signbit(frames[:, 1:]) != np.signbit(frames[:, :-1]), axis=1)
+
+        speech = np.empty(n, dtype=bool)
+        for i in range(n):
+            floor = self.noise_db
+            speech[i] = db[i] > self.min_db and (
+                db[i] > floor + self.margin_db
+                or (db[i] > floor + self.margin_db / 2 and zcr[i] > self.zcr_threshold)
+            )
+            rate = 0.5 if db[i] < floor else (0.001 if speech[i] else 0.02)
+            self.noise_db = floor + rate * (max(db[i], self.min_db) - floor)
+        return speech
+
+
+class Endpointer:
+    """
+    Decides where a command ends after the wake word.
+
+    feed() takes consecutive chunks from the utterance start and returns
+    (start, n) once there has been `silence` seconds of non-speech after
+    some speech and at least `min_len` seconds have passed, or when
+    `max_len` is reached. If no speech was heard within `no_speech`
+    seconds it returns (start, 0).
+    """
+
+    def __init__(self, vad, rate=SAMPLE_RATE, min_len=MIN_RECORD_SECONDS,
+                 max_len=MAX_RECORD_SECONDS, silence=VAD_SILENCE_SECONDS,
+                 no_speech=NO_SPEECH_SECONDS, tail=0.1):
+        self.vad = vad              # None records a fixed max_len window
+        self.rate = rate
+        self.min_len = int(min_len * rate)
+        self.max_len = int(max_len * rate)
+        self.no_speech = int(no_speech * rate)
+        self.silence = int(silence * rate)
+        self.tail = int(tail * rate)
+        self.start = None
+
+    @property
+    def active(self):
+        return self.start is not None
+
+    def begin(self, start):
+        self.start = start
+        self.length = 0
+        self.speech_end = None
+
+    def cancel(self):
+        self.start = None
+
+    def feed(self, samples):
+        if self.vad is None:
+            self.length += len(samples)
+            if self.length < self.max_len:
+                return None
+            start, self.start = self.start, None
+            return start, self.max_len
+
+        frame = self.vad.frame
+        for i, is_speech in enumerate(self.vad.frames(samples)):
+            pos = self.length + (i + 1) * frame
+            if is_speech:
+                self.speech_end = pos
+        self.length += len(samples)
+
+        if self.speech_end is None:
+            done = self.length >= min(self.no_speech, self.max_len)
+        else:
+            done = self.length >= self.max_len or (
+                self.length >= self.min_len
+                and self.length - self.speech_end >= self.silence
+            )
+        if not done:
+            return None
+        start, self.start = self.start, None
+        if self.speech_end is None:
+            return start, 0
+        return start, min(self.length, self.max_len, self.speech_end + self.tail)
+
+
+class WakeWordSpotter:
+    """
+    PocketSphinx keyphrase search fed from the ring.
+
+    Remembers the ring position where the current decoder utterance
+    started, so segment timing can be mapped back to ring positions.
+    """
+
+    def __init__(self, decoder, rate=SAMPLE_RATE):
+        self.decoder = decoder
+        try:
+            frate = int(decoder.config['frate'])
+        except Exception:
+            frate = 100
+        self.frame_samples = rate // frate
+        self.utt_start = None
+
+    def restart(self, pos):
+        """Start a new decoder utterance whose first sample is ring position pos"""
+        self.stop()
+        self.decoder.start_utt()
+        self.utt_start = pos
+
+    def stop(self):
+        if self.utt_start is not None:
+            self.decoder.end_utt()
+            self.utt_start = None
+
+    def process(self, samples):
+        self.decoder.process_raw(samples.tobytes(), False, False)
+
+    def hypothesis(self):
+        hyp = self.decoder.hyp()
+        return None if hyp is None else hyp.hypstr.lower().strip()
+
+    def keyphrase_end(self):
+        """Ring position just after the detected keyphrase, or None if unknown"""
+        try:
+            end_frame = max(seg.end_frame for seg in self.decoder.seg())
+        except Exception:
+            return None
+        return self.utt_start + (end_frame + 1) * self.frame_samples
+
+
+class CommandSpotter(WakeWordSpotter):
+    """
+    Keyphrase search over the command vocabulary (commands.kws, generated by
+    make_command_vocab.py), run on the first `window` samples after a wake
+    word. A confident hit is the command; Whisper is only needed when
+    nothing in the vocabulary was heard.
+
+    A phrase that is part of a longer one ("delay" in "grain delay") can
+    fire before the longer phrase does, so it is only taken once the
+    command has been endpointed.
+    """
+
+    def __init__(self, decoder, commands, window, rate=SAMPLE_RATE):
+        super().__init__(decoder, rate)
+        self.commands = commands    # phrase -> (program, device name)
+        self.window = int(window * rate)
+        self.partial = {p for p in commands
+                        if any(p != q and f" {p} " in f" {q} " for q in commands)}
+        self.length = 0
+        self.best = None
+        self.best_end = None
+
+    @property
+    def active(self):
+        return self.utt_start is not None
+
+    @property
+    def expired(self):
+        return self.length >= self.window
+
+    def restart(self, pos):
+        super().restart(pos)
+        self.length = 0
+        self.best = None
+        self.best_end = None
+
+    def process(self, samples):
+        super().process(samples)
+        self.length += len(samples)
+
+    def detect(self):
+        """(program, device name) once a command is certain, else None"""
+        if self.decoder.hyp() is None:
+            return None
+        # the latest detection wins; at the same end frame, the longer phrase
+        segments = [seg for seg in self.decoder.seg() if seg.word in self.commands]
+        if not segments:
+            return None
+        seg = max(segments, key=lambda seg: (seg.end_frame, len(seg.word)))
+        self.best = seg.word
+        self.best_end = self.utt_start + (seg.end_frame + 1) * self.frame_samples
+        return None if seg.word in self.partial else self.commands[seg.word]
+
+    def result(self):
+        """Best command heard so far, or None"""
+        return None if self.best is None else self.commands[self.best]
+
+
+def load_commands(path):
+    """{spoken phrase: (program, device name)} from commands.tsv"""
+    commands = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                program, name, phrase = line.rstrip('\n').split('\t')
+                commands[phrase] = (int(program), name)
+    return commands
+
+
+class WakeGate:
+    """
+    Energy gate in front of the wake word spotter, so PocketSphinx doesn't
+    decode long silences between takes.
+
+    Uses an EnergyVAD with a lower margin than endpointing. While no frame
+    is above the noise floor for `hang` seconds, chunks are skipped. When
+    sound comes back the spotter restarts `lookback` seconds earlier (the
+    audio is still in the ring), so quiet onsets such as the "h" of "hey"
+    are decoded too.
+    """
+
+    def __init__(self, rate=SAMPLE_RATE, margin_db=GATE_MARGIN_DB, hang=GATE_HANG_SECONDS,
+                 lookback=GATE_LOOKBACK_SECONDS):
+        self.vad = EnergyVAD(rate, margin_db=margin_db, min_db=-70.0)
+        self.hang = int(hang * rate)
+        self.lookback = int(lookback * rate)
+        self.open_until = 0
+        self.is_open = True
+        self.just_opened = False
+        self.chunks = 0
+        self.skipped = 0
+        self.decoded = 0
+        self.decode_time = 0.0
+
+    def update(self, end, samples):
+        """
+        For the chunk ending at ring position `end`: None if the spotter
+        can skip it, else the ring position to decode from. That is the
+        chunk start, or `lookback` earlier when the gate has just opened
+        (`just_opened` is then set and the spotter should restart there).
+        """
+        self.chunks += 1
+        start = end - len(samples)
+        self.just_opened = False
+        if self.vad.frames(samples).any():
+            self.open_until = end + self.hang
+            if not self.is_open:
+                self.is_open = self.just_opened = True
+                return max(0, start - self.lookback)
+        if self.is_open and end <= self.open_until:
+            return start
+        self.is_open = False
+        self.skipped += 1
+        return None
+
+    def report(self):
+        if not self.chunks:
+            return "no audio"
+        per_chunk = self.decode_time / max(self.decoded, 1)
+        return (f"skipped {self.skipped / self.chunks:.0%} of {self.chunks} chunks, "
+                f"~{self.skipped * per_chunk:.1f}s decoder CPU saved "
+                f"({per_chunk * 1000:.2f} ms per decoded chunk)")
+
+
+class Dictation:
+    """
+    Continuous transcription without the wake word, driven chunk by chunk
+    like the Endpointer.
+
+    Speech is split into phrases at pauses. While a phrase is open, its
+    audio so far is decoded again every `step` seconds. Words on which two
+    consecutive decodes agree are stable (local agreement) and printed
+    once as FINAL:<words>; the rest of the latest decode is PARTIAL:<words>.
+    A PARTIAL line always follows a FINAL one, empty when the phrase closed.
+    A pause closes the phrase with one last decode, all of it final.
+
+    Decode cost is bounded three ways:
+    - the window never exceeds `max_len`: longer phrases are cut, and the
+      next phrase starts `overlap` seconds before the cut. The last word
+      before the cut may be clipped, so it is left for the next phrase,
+      which drops the words it repeats;
+    - the last dictated words are the prompt, so a cut phrase keeps its
+      context without decoding old audio again;
+    - after a decode that took d seconds, the next partial decode waits
+      d / `budget` seconds, so partial decoding uses at most `budget` of
+      one core at real time.
+    Final decodes are not delayed, since a phrase can't close without one,
+    so they are outside the budget. Each covers at most `max_len` of audio,
+    so one costs at most as much as the longest partial decode. A final
+    decode also pushes back the next partial one, so the total stays near
+    the budget unless phrases are very short. report() gives both shares.
+    """
+
+    CARRY_WORDS = 8     # words of a cut phrase the overlap may repeat
+
+    def __init__(self, ring, transcribe, vad, ready=lambda: True,
+                 step=DICTATION_STEP_SECONDS, pause=DICTATION_PAUSE_SECONDS,
+                 max_len=DICTATION_MAX_SECONDS, overlap=DICTATION_OVERLAP_SECONDS,
+                 budget=DICTATION_CPU_BUDGET, prompt_words=DICTATION_PROMPT_WORDS,
+                 lookback=GATE_LOOKBACK_SECONDS):
+        rate = ring.rate
+        self.ring = ring
+        self.transcribe = transcribe    # (float32 audio, prompt) -> text
+        self.vad = vad
+        self.ready = ready
+        self.step = int(step * rate)
+        self.pause = int(pause * rate)
+        self.max_len = int(max_len * rate)
+        self.overlap = int(overlap * rate)
+        self.lookback = int(lookback * rate)
+        self.budget = budget
+        self.prompt_words = prompt_words
+        self.context = []       # every word made final, for the prompt
+        self.carry = []         # last words before a cut, which the overlap repeats
+        self.start = None       # ring position of the open phrase
+        self.decodes = {False: 0, True: 0}         # final -> count
+        self.decode_time = {False: 0.0, True: 0.0}  # final -> seconds
+        self.t_start = time.monotonic()
+        self._new_phrase(None)
+
+    def _new_phrase(self, start):
+        self.start = start
+        self.silence = 0
+        self.committed = 0      # words of this phrase already final
+        self.previous = None    # words of the last decode
+        self.partial = ''
+        self.decoded_to = start or 0
+        self.next_due = 0.0
+
+    def feed(self, end, samples, caught_up=True):
+        """
+        Samples ending at ring position `end`. caught_up: no more audio is
+        waiting in the ring, so a partial decode won't be stale.
+        """
+        speech = self.vad.frames(samples).any()
+        if self.start is None:
+            if speech:
+                self._new_phrase(max(0, end - len(samples) - self.lookback))
+            return
+        self.silence = 0 if speech else self.silence + len(samples)
+        if self.silence >= self.pause:
+            self._decode(end, final=True)
+            self.carry = []
+            self._new_phrase(None)
+        elif end - self.start >= self.max_len:
+            self._decode(end, final=True, hold=1)
+            self.carry = self.context[-self.CARRY_WORDS:]
+            self._new_phrase(end - self.overlap)
+        elif (caught_up and end - self.decoded_to >= self.step
+              and time.monotonic() >= self.next_due):
+            self._decode(end, final=False)
+
+    def close(self, end):
+        """Finish the open phrase, e.g. when dictation is stopped"""
+        if self.start is not None and end > self.start:
+            self._decode(end, final=True)
+        self.carry = []
+        self._new_phrase(None)
+
+    def _decode(self, end, final, hold=0):
+        """Decode the open phrase up to `end`; final: all but `hold` words become final"""
+        if not self.ready():
+            if final:
+                emit("STATUS: Whisper not ready; dictated phrase dropped", sys.stderr)
+            return
+        t0 = time.monotonic()
+        _, audio = self.ring.read(self.start, end - self.start)
+        prompt = ' '.join(self.context[-self.prompt_words:])
+        words = self._dedupe(self.transcribe(audio.astype(np.float32) / 32768.0, prompt).split())
+        took = time.monotonic() - t0
+        self.decodes[final] += 1
+        self.decode_time[final] += took
+        self.next_due = t0 + took / self.budget
+        self.decoded_to = end
+
+        if final:
+            stable = words[:max(0, len(words) - hold)]
+        elif self.previous is None:
+            stable = []
+        else:
+            stable = self.previous[:common_prefix(self.previous, words)]
+        self.previous = words
+        new = stable[self.committed:]
+        if new:
+            text = ' '.join(new)
+            emit(f"FINAL:{text}", event='final', text=text,
+                 audio_s=round(len(audio) / self.ring.rate, 3), decode_ms=round(took * 1000, 1))
+            self.context += new
+            self.committed = len(stable)
+        partial = '' if final else ' '.join(words[self.committed:])
+        if new or partial != self.partial:
+            emit(f"PARTIAL:{partial}", event='partial', text=partial)
+            self.partial = partial
+
+    def _dedupe(self, words):
+        """
+        Drop the start of words that repeats the end of the phrase before a
+        cut. The first word may itself be clipped by the window start.
+        """
+        for k in range(min(len(self.carry), len(words)), 0, -1):
+            if (common_prefix(self.carry[-k:], words[:k]) == k
+                    or k > 1 and common_prefix(self.carry[1 - k:], words[1:k]) == k - 1):
+                return words[k:]
+        return words
+
+    def report(self):
+        wall = max(time.monotonic() - self.t_start, 1e-9)
+        return (f"{self.decodes[False]} partial decodes, {self.decode_time[False] / wall:.0%} "
+                f"of real time (budget {self.budget:.0%}); {self.decodes[True]} final decodes, "
+                f"{self.decode_time[True] / wall:.0%}")
+
+
+def common_prefix(a, b):
+    """Number of leading words a and b share, ignoring case and punctuation"""
+    n = 0
+    for x, y in zip(a, b):
+        if normalize(x) != normalize(y):
+            break
+        n += 1
+    return n
+
+
+def warm_up(transcribe, runs=WARMUP_RUNS, seconds=WARMUP_SECONDS):
+    """
+    Push a synthetic clip through transcribe() so kernel setup, mel filters
+    and the tokenizer are built before the first real command. Returns the
+    per-run times in seconds.
+    """
+    if runs <= 0:
         return []
+    # faint noise rather than digital silence, so the decoder does real work
+    rng = np.random.default_rng(0)
+    clip = (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 1e-3).astype(np.float32)
+    times = []
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        transcribe(clip)
+        times.append(time.perf_counter() - t0)
+    report = f"cold {times[0] * 1000:.0f} ms"
+    if len(times) > 1:
+        report += f", warm {min(times[1:]) * 1000:.0f} ms"
+    emit(f"STATUS: Whisper warm-up: {report}", sys.stderr, event='warmup',
+         runs_ms=[round(t * 1000, 1) for t in times])
+    return times
+
+def summarize_ms(values):
+    """'n=…, mean … ms, p95 … ms' for a list of durations in seconds"""
+    if not values:
+        return "n=0"
+    ms = np.asarray(values) * 1000
+    return f"n={len(ms)}, mean {ms.mean():.0f} ms, p95 {np.percentile(ms, 95):.0f} ms, max {ms.max():.0f} ms"
+
+def report_capture_stats(ring):
+    emit(f"STATUS: Audio overflows: {ring.overflows}, dropped samples: {ring.dropped}",
+         sys.stderr)
+
+def input_files(args):
+    """WAV files to stream instead of the microphone, in order"""
+    paths = list(args.input_wav or [])
+    if args.input_dir:
+        paths += sorted(os.path.join(args.input_dir, name) for name in os.listdir(args.input_dir)
+                        if name.lower().endswith('.wav'))
+    return paths
+
+def shared_torch_threads(args):
+    """True if the workers share torch's process-wide thread pool"""
+    return args.backend != 'faster-whisper' and not args.worker_processes
+
+
+def worker_threads(args):
+    """
+    Decoder threads: --torch-threads, or half the cores. Worker processes
+    and faster-whisper models each have their own threads, so the cores are
+    split over the workers; whisper workers in threads share one pool.
+    """
+    if args.torch_threads:
+        return args.torch_threads
+    workers = 1 if shared_torch_threads(args) else args.workers
+    return max(1, (os.cpu_count() or 2) // 2 // workers)
+
+def create_backends_from_args(args):
+    """
+    One ASR backend per transcription worker, as selected on the command
+    line (not loaded yet). With --worker-processes each runs in its own
+    process.
+    """
+    vocab = None
+    if args.vocab:
+        vocab = Vocabulary.load(args.vocab, snap_distance=args.snap_distance)
+        emit(f"STATUS: Vocabulary: {len(vocab)} entries from {args.vocab}", sys.stderr)
+
+    threads = worker_threads(args)
+    if args.backend == 'faster-whisper':
+        model_dir = args.model_dir or get_resource_path(
+            os.path.join('models', f'faster-whisper-{args.model}'))
+        kwargs = dict(model_size=args.model, model_dir=model_dir, vocab=vocab,
+                      cpu_threads=threads)
+    else:
+        cache_path = None
+        if args.quantize:
+            cache_path = args.quantized_cache or os.path.join(
+                os.path.expanduser('~'), '.cache', 'whisper', f'{args.model}-int8.pt')
+        kwargs = dict(model_size=args.model, model_dir=args.model_dir, vocab=vocab,
+                      quantize=args.quantize, cache_path=cache_path, mmap=args.mmap,
+                      short=args.short_commands, max_tokens=args.max_tokens,
+                      bias=args.vocab_bias, threads=threads)
+
+    if args.worker_processes:
+        return [ProcessBackend(args.backend, **kwargs) for _ in range(args.workers)]
+    return [create_backend(args.backend, **kwargs) for _ in range(args.workers)]
+
+class Controller:
+    """
+    State behind the --daemon control socket.
+
+    Models stay loaded for the life of the process; a listening session
+    opens the audio device on `start` and closes it on `stop`. Socket
+    handlers only change state and wake the main thread, which runs the
+    sessions (next_session) and reports back with opened(). `start` is
+    answered once the device is open, with ERROR:<reason> if it could not
+    be. Changing the device or channel while listening ends the session
+    and the next one opens the new device; if that fails, listening stops
+    with a `STATUS: Listening stopped: <reason>` line. A session that ends
+    by itself (input files exhausted) or on `stop` prints
+    `STATUS: Listening stopped`.
+
+    One command per line, one reply line each: OK, OK:<json> or ERROR:<message>.
+
+        list-devices        OK:[{"index": ..., "name": ..., ...}]
+        set-device <index>  OK
+        set-channel <n>     OK (input channel from 1; 0 = average all channels)
+        dictation on|off    OK (sessions transcribe everything, no wake word)
+        jsonl on|off        OK (switch the stdout protocol to JSON lines and back)
+        start               OK once the device is open, or ERROR:<reason>
+        stop                OK
+        status              OK:{"listening": ..., "device": ..., "channel": ..., "dictation": ...,
+                               "whisper": ...}
+        shutdown            OK
+    """
+
+    def __init__(self, loader, device=None, channel=0, dictation=False):
+        self.loader = loader
+        self.device = device
+        self.channel = channel              # 0-based, None = downmix
+        self.dictation = dictation
+        self.listening = False
+        self.opening = False                # a start waits for the device to open
+        self.open_error = None
+        self.running = True
+        self.stop = threading.Event()     # set to end the current session
+        self._cond = threading.Condition()
+
+    def handle(self, line):
+        command, _, arg = line.strip().partition(' ')
+        if command == 'list-devices':
+            try:
+                # an open capture stream would make an in-process scan stale
+                return f"OK:{json.dumps(scan_audio_devices(fresh=self.listening))}"
+            except Exception as e:
+                return f"ERROR:device scan failed: {e}"
+        with self._cond:
+            if command == 'set-device':
+                try:
+                    self.device = int(arg)
+                except ValueError:
+                    return f"ERROR:bad device index '{arg}'"
+                self.stop.set()
+            elif command == 'set-channel':
+                try:
+                    channel = int(arg)
+                except ValueError:
+                    return f"ERROR:bad channel '{arg}'"
+                if channel < 0:
+                    return f"ERROR:bad channel '{arg}'"
+                self.channel = channel - 1 if channel else None
+                self.stop.set()
+            elif command == 'dictation':
+                if arg not in ('on', 'off'):
+                    return "ERROR:expected 'dictation on' or 'dictation off'"
+                self.dictation = arg == 'on'
+                self.stop.set()
+            elif command == 'jsonl':
+                if arg not in ('on', 'off'):
+                    return "ERROR:expected 'jsonl on' or 'jsonl off'"
+                global _jsonl
+                _jsonl = arg == 'on'
+            elif command == 'start':
+                if not self.listening or self.opening:
+                    self.listening = self.opening = True
+                    self._cond.notify_all()
+                    self._cond.wait_for(lambda: not self.opening or not self.running)
+                    if self.opening:
+                        return "ERROR:shutting down"
+                    if self.open_error is not None:
+                        return f"ERROR:{self.open_error}"
+                return "OK"
+            elif command == 'stop':
+                self.listening = False
+                self.stop.set()
+            elif command == 'status':
+                whisper = ('failed' if self.loader.error is not None
+                           else 'ready' if self.loader.ready.is_set() else 'loading')
+                channel = 0 if self.channel is None else self.channel + 1
+                return "OK:" + json.dumps({'listening': self.listening, 'device': self.device,
+                                           'channel': channel, 'dictation': self.dictation,
+                                           'whisper': whisper})
+            elif command == 'shutdown':
+                self.running = False
+                self.stop.set()
+            else:
+                return f"ERROR:unknown command '{command}'"
+            self._cond.notify_all()
+        return "OK"
+
+    def next_session(self):
+        """Wait for `start`; (True, device, channel, dictation) to listen, (False, ...) on shutdown"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.listening or not self.running)
+            self.stop.clear()
+            return self.running, self.device, self.channel, self.dictation
+
+    def opened(self, error=None):
+        """
+        The session opened its device, or could not (`error`; listening
+        stops until the next start). True if a `start` was waiting for this.
+        """
+        with self._cond:
+            waiting = self.opening
+            self.opening = False
+            self.open_error = error
+            if error is not None:
+                self.listening = False
+            self._cond.notify_all()
+            return waiting
+
+    def shutdown(self):
+        with self._cond:
+            self.running = False
+            self.stop.set()
+            self._cond.notify_all()
+
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode('utf-8', 'replace').strip()
+            if line:
+                reply = self.server.controller.handle(line)
+                self.wfile.write((reply + '\n').encode('utf-8'))
+
 
-def run_transcription(device_index=None):
+def serve_control(controller, port):
+    """Start the control socket on CONTROL_HOST:port (0 = any free port) in the background"""
+    server = socketserver.ThreadingTCPServer((CONTROL_HOST, port), ControlHandler)
+    server.daemon_threads = True
+    server.controller = controller
+    threading.Thread(target=server.serve_forever, name="control", daemon=True).start()
+    port = server.server_address[1]
+    emit(f"CONTROL:{port}", event='control', host=CONTROL_HOST, port=port)
+    return server
+
+def run_transcription(args):
     """Main transcription function"""
     
-    # Load Whisper Model
-    try:
-        print("STATUS: Loading Whisper model...", file=sys.stderr)
-        whisper_model = whisper.load_model("base")  # Better accuracy than tiny
-        print("STATUS: Whisper model loaded", file=sys.stderr)
-    except Exception as e:
-        print(f"ERROR: Failed to load Whisper model: {e}", file=sys.stderr)
-        return False
+    # Wake word spotting and capture come up first; Whisper loads in the
+    # background and utterances queue until it is ready.
 
     # PocketSphinx Configuration
     try:
-        print("STATUS: Creating PocketSphinx configuration...", file=sys.stderr)
+        from pocketsphinx import Decoder, Config
+        emit("STATUS: Creating PocketSphinx configuration...", sys.stderr)
+        # wake phrase and threshold live in keywords.kws (tune_kws_threshold.py)
         config = Config(
             hmm=get_resource_path('en-us'),
             dict=get_resource_path('dictionary.dict'),
-            keyphrase='hey max',
-            kws_threshold=1e-1
+            kws=get_resource_path('keywords.kws')
         )
         decoder = Decoder(config)
-        print("STATUS: PocketSphinx initialized", file=sys.stderr)
+        emit("STATUS: PocketSphinx initialized", sys.stderr)
+        emit("READY:kws", event='ready', component='kws')
     except Exception as e:
-        print(f"ERROR: Failed to initialize PocketSphinx: {e}", file=sys.stderr)
+        emit(f"ERROR: Failed to initialize PocketSphinx: {e}", sys.stderr)
         return False
 
-    # Initialize PyAudio
-    try:
-        p = pyaudio.PyAudio()
-        
-        # Use specified device or default
-        stream_kwargs = {
-            'format': pyaudio.paInt16,
-            'channels': 1,
-            'rate': SAMPLE_RATE,
-            'input': True,
-            'frames_per_buffer': CHUNK_SIZE
-        }
-        
-        if device_index is not None:
-            stream_kwargs['input_device_index'] = device_index
-            # Get device info for confirmation
-            device_info = p.get_device_info_by_index(device_index)
-            print(f"STATUS: Using audio device: {device_info['name']}", file=sys.stderr)
-        
-        stream = p.open(**stream_kwargs)
-        print("STATUS: Audio stream opened", file=sys.stderr)
-        
-    except Exception as e:
-        print(f"ERROR: Failed to open audio stream: {e}", file=sys.stderr)
-        return False
+    # Command vocabulary: optional, without it every command goes to Whisper
+    commands = None
+    if args.commands:
+        try:
+            command_config = Config(
+                hmm=get_resource_path('en-us'),
+                dict=get_resource_path('commands.dict'),
+                kws=get_resource_path('commands.kws')
+            )
+            commands = CommandSpotter(Decoder(command_config),
+                                      load_commands(get_resource_path('commands.tsv')),
+                                      args.command_window)
+            emit(f"STATUS: Command vocabulary loaded ({len(commands.commands)} commands)",
+                 sys.stderr)
+        except Exception as e:
+            emit(f"STATUS: Command vocabulary unavailable, using Whisper only: {e}",
+                 sys.stderr)
 
-    # Main listening loop
-    try:
-        print("STATUS: Listening for 'Hey Max'...")
-        sys.stdout.flush()
-        
-        decoder.start_utt()
+    # Load Whisper Model (started after the audio stream is up), one per worker
+    backends = create_backends_from_args(args)
+
+    def load_whisper():
+        emit(f"STATUS: Loading {backends[0].describe()} model"
+             + (f" x{len(backends)}" if len(backends) > 1 else "")
+             + f", {worker_threads(args)} thread(s) "
+             + ("shared..." if shared_torch_threads(args) else "each..."), sys.stderr)
+        for backend in backends:
+            if isinstance(backend, ProcessBackend):
+                backend.start()     # processes load in parallel
+        for backend in backends:
+            backend.load()
+            # READY is only reported once this returns, i.e. after warm-up
+            warm_up(backend.transcribe, args.warmup_runs)
+        return backends
+
+    def transcribe(backend, audio):
+        text = backend.transcribe(audio)
+        if backend.vocab is not None:
+            snapped = backend.vocab.snap(text)
+            if snapped != text:
+                emit(f"STATUS: Snapped '{text}' to '{snapped}'", sys.stderr, event='snapped',
+                     heard=text, text=snapped)
+            text = snapped
+        return text
+
+    loader = ModelLoader("whisper", load_whisper)
+
+    # One ring for the whole run; in daemon mode each listening session
+    # opens the device again and keeps writing where the last one stopped
+    ring = AudioRingBuffer()
+    input_paths = input_files(args)
+    control = server = None
+    if args.daemon:
+        control = Controller(loader, args.device, args.input_channel, args.dictation)
+        try:
+            server = serve_control(control, args.control_port)
+        except OSError as e:
+            emit(f"ERROR: Failed to open control socket: {e}", sys.stderr)
+            return False
+        loader.start()      # nothing to capture until `start`
+
+    pool = TranscriptionPool(loader, transcribe, args.workers, args.queue_size, args.queue_policy)
+    pool.start()
+
+    vad = EnergyVAD()
+    if args.vad:
+        endpointer = Endpointer(vad, min_len=args.min_record,
+                                max_len=args.max_record, silence=args.vad_silence)
+    else:
+        endpointer = Endpointer(None, max_len=RECORD_SECONDS)
+
+    command_latencies = []
+    wake_latencies = []
+
+    def emit_command(match):
+        program, name = match
+        latency = time.monotonic() - ring.time_of(commands.best_end)
+        emit(f"COMMAND:{program} {name}", event='command', program=program, name=name,
+             phrase=commands.best, latency_ms=round(latency * 1000, 1))
+        command_latencies.append(latency)
+        detail(f"STATUS: Command '{commands.best}' after {latency * 1000:.0f} ms")
+        commands.stop()
+        emit("STATUS: Listening for 'Hey Max'...")
+
+    def endpoint(samples):
+        done = endpointer.feed(samples)
+        if done is None:
+            return
+        utt_start, utt_len = done
+        match = None
+        if commands is not None and commands.active:
+            match = commands.result()
+            commands.stop()
+        if match is not None:
+            emit_command(match)
+        elif utt_len > 0:
+            emit(f"STATUS: Recorded {utt_len / SAMPLE_RATE:.2f}s", sys.stderr, event='recorded',
+                 capture_s=round(utt_len / SAMPLE_RATE, 3), queue_depth=pool.jobs.qsize())
+            _, audio = ring.read(utt_start, utt_len)
+            pool.submit(Utterance(audio, utt_start, ring.time_of(utt_start + utt_len)))
+        else:
+            emit("STATUS: No speech after wake word")
+            emit("STATUS: Listening for 'Hey Max'...")
+
+    def listen(samples):
+        """Feed audio after the wake word to the command spotter and the endpointer"""
+        if commands is not None and commands.active and not commands.expired:
+            commands.process(samples)
+            match = commands.detect()
+            if match is not None:
+                endpointer.cancel()
+                emit_command(match)
+                return
+        endpoint(samples)
+
+    def open_capture(device, channel):
+        """Start audio input (files or the device): (capture, None), or (None, reason)"""
+        # Input files are streamed once the model is up, so they measure
+        # the warm pipeline.
+        if input_paths:
+            capture = WavSource(ring, input_paths, args.chunk_size, realtime=args.realtime,
+                                gap=args.input_gap, wait_for=loader.ready)
+            capture.idle = lambda: (not endpointer.active and pool.jobs.unfinished_tasks == 0
+                                    and (dictation is None or dictation.start is None))
+        else:
+            capture = AudioCapture(ring, device, args.chunk_size, rate=args.capture_rate,
+                                   channel=channel)
+        try:
+            capture.start()
+            emit("STATUS: Audio stream opened", sys.stderr)
+            emit("READY:audio", event='ready', component='audio')
+        except Exception as e:
+            emit(f"ERROR: Failed to open audio stream: {e}", sys.stderr)
+            capture.close()
+            return None, f"failed to open audio stream: {e}"
+        return capture, None
+
+    gate = WakeGate() if args.gate else None
+    dictation = None
+    wake_sessions = 0
+
+    def session(capture, pos, stop):
+        """
+        Listen for wake words from ring position `pos` (where the capture
+        started) until `stop` is set, the input files run out or Whisper
+        failed to load. False if interrupted with Ctrl-C.
+        """
+        nonlocal wake_sessions
+        wake_sessions += 1
+        # Main listening loop: the wake word spotter is one consumer of the ring
+        spotter = WakeWordSpotter(decoder)
+        emit("STATUS: Listening for 'Hey Max'...")
+
+        spotter.restart(pos)
         chunk_count = 0
+        last_check = pos
+        announced_ready = False
+        dot_every = max(1, int(4 * SAMPLE_RATE / args.chunk_size))
+        last_stats = time.monotonic()
+        reported = (ring.overflows, ring.dropped)
 
-        while True:
-            try:
-                buf = stream.read(CHUNK_SIZE, exception_on_overflow=False)
-                if buf:
-                    decoder.process_raw(buf, False, False)
+        try:
+            while loader.error is None and not stop.is_set():
+                try:
+                    got = ring.read(pos, args.chunk_size, timeout=1.0)
+                    if got is None:
+                        if capture.exhausted() and pos >= ring.written:
+                            break
+                        continue
+                    start, samples = got
+                    pos = start + len(samples)
                     chunk_count += 1
-                    
-                    # Check for detection every 8 chunks
-                    if chunk_count % 8 == 0:
-                        hyp = decoder.hyp()
-                        if hyp is not None:
-                            detected_text = hyp.hypstr.lower().strip()
-                            
-                            if 'hey max' in detected_text:
-                                print("STATUS: Wake word detected! Recording...")
-                                sys.stdout.flush()
-                                
-                                decoder.end_utt()
-                                
-                                # Record audio for transcription
-                                frames = []
-                                for _ in range(0, int(SAMPLE_RATE / CHUNK_SIZE * RECORD_SECONDS)):
-                                    data = stream.read(CHUNK_SIZE, exception_on_overflow=False)
-                                    frames.append(data)
-                                
-                                # Transcribe with Whisper
-                                audio_data = np.frombuffer(b''.join(frames), dtype=np.int16)
-                                audio_float = audio_data.astype(np.float32) / 32768.0
-                                
-                                print("STATUS: Transcribing...")
-                                sys.stdout.flush()
-                                
-                                result = whisper_model.transcribe(
-                                    audio_float,
-                                    fp16=False,
-                                    language='en',
-                                    condition_on_previous_text=False,
-                                    temperature=0,
-                                    best_of=1,
-                                    beam_size=1,
-                                    word_timestamps=False
-                                )
-                                
-                                transcription = result['text'].strip()
-                                if transcription:
-                                    print(f"TRANSCRIPTION:{transcription}")
-                                    sys.stdout.flush()
-                                
-                                print("STATUS: Listening for 'Hey Max'...")
-                                sys.stdout.flush()
-                                decoder.start_utt()
-                                chunk_count = 0
-                            else:
-                                # Reset decoder after detection
-                                decoder.end_utt()
-                                decoder.start_utt()
-                        else:
-                            # Show activity
-                            if chunk_count % 64 == 0:
-                                print(".", end="", flush=True, file=sys.stderr)
-            
-            except KeyboardInterrupt:
-                break
-            except Exception as e:
-                print(f"ERROR: Audio processing error: {e}", file=sys.stderr)
+
+                    # Decode unless the gate says the room is quiet
+                    feed_from = start if gate is None else gate.update(pos, samples)
+                    if feed_from is not None:
+                        t0 = time.perf_counter()
+                        if gate is not None and gate.just_opened:
+                            spotter.restart(feed_from)
+                            if feed_from < start:
+                                spotter.process(ring.read(feed_from, start - feed_from)[1])
+                        spotter.process(samples)
+                        if gate is not None:
+                            gate.decode_time += time.perf_counter() - t0
+                            gate.decoded += 1
+
+                    if not announced_ready and loader.ready.is_set():
+                        # every component is up; wake words go straight to Whisper
+                        emit("READY", event='ready', component='all')
+                        announced_ready = True
+
+                    # Endpoint the command that follows a wake word
+                    if endpointer.active:
+                        listen(samples)
+                    elif args.vad:
+                        # keep the noise floor current between commands
+                        vad.frames(samples)
+
+                    # Check for detection after every decoded chunk. The decoder
+                    # keeps its acoustic context and is only reset after a
+                    # detection or when the gate reopens.
+                    detected_text = spotter.hypothesis() if feed_from is not None else None
+                    if detected_text is not None:
+                        if 'hey max' in detected_text and not endpointer.active:
+                            # The command starts where the keyphrase ended;
+                            # that audio is already in the ring, so nothing
+                            # said straight after the wake word is lost
+                            wake_end = spotter.keyphrase_end()
+                            if wake_end is None or wake_end > pos:
+                                wake_end = last_check
+                            latency = time.monotonic() - ring.time_of(wake_end)
+                            emit("STATUS: Wake word detected! Recording...", event='wake',
+                                 detect_ms=round(latency * 1000, 1))
+                            wake_latencies.append(latency)
+                            detail(f"STATUS: Wake latency {latency * 1000:.0f} ms")
+                            endpointer.begin(wake_end)
+                            if commands is not None:
+                                commands.restart(wake_end)
+                            if wake_end < pos:
+                                _, backlog = ring.read(wake_end, pos - wake_end)
+                                listen(backlog)
+
+                        # Reset decoder after detection
+                        spotter.restart(pos)
+                    elif chunk_count % dot_every == 0 and not _jsonl:
+                        # Show activity
+                        print(".", end="", flush=True, file=sys.stderr)
+                    last_check = pos
+
+                    now = time.monotonic()
+                    if now - last_stats >= STATS_INTERVAL:
+                        last_stats = now
+                        if (ring.overflows, ring.dropped) != reported:
+                            reported = (ring.overflows, ring.dropped)
+                            report_capture_stats(ring)
+                        if gate is not None:
+                            emit(f"STATUS: Wake gate {gate.report()}", sys.stderr)
+
+                except KeyboardInterrupt:
+                    return False
+                except Exception as e:
+                    emit(f"ERROR: Audio processing error: {e}", sys.stderr)
+                    try:
+                        spotter.restart(pos)
+                    except:
+                        pass
+        finally:
+            # a command cut off by `stop` is dropped, not transcribed
+            spotter.stop()
+            endpointer.cancel()
+            if commands is not None:
+                commands.stop()
+        return True
+
+    def dictation_session(capture, pos, stop):
+        """
+        Transcribe everything said from ring position `pos`, without the
+        wake word, until `stop` is set or the input files run out.
+        False if interrupted with Ctrl-C.
+        """
+        nonlocal dictation
+        pool.jobs.join()        # one thread at a time in a backend
+        dictation = Dictation(ring, lambda audio, prompt: loader.model[0].transcribe(audio, prompt),
+                              vad, ready=loader.ready.is_set, step=args.dictation_step,
+                              budget=args.dictation_budget)
+        emit("STATUS: Dictating...", event='dictation')
+        announced_ready = False
+        try:
+            while loader.error is None and not stop.is_set():
+                if not announced_ready and loader.ready.is_set():
+                    emit("READY", event='ready', component='all')
+                    announced_ready = True
+                got = ring.read(pos, args.chunk_size, timeout=1.0)
+                if got is None:
+                    if capture.exhausted() and pos >= ring.written:
+                        break
+                    continue
+                start, samples = got
+                pos = start + len(samples)
+                dictation.feed(pos, samples, caught_up=ring.written - pos < args.chunk_size)
+        except KeyboardInterrupt:
+            return False
+        finally:
+            dictation.close(pos)
+            if control is not None:     # without the daemon the summary reports it
+                emit(f"STATUS: Dictation {dictation.report()}", sys.stderr)
+        return True
+
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    try:
+        if control is None:
+            pos = ring.written
+            capture, _ = open_capture(args.device, args.input_channel)
+            if capture is None:
+                return False
+            loader.start()
+            try:
+                (dictation_session if args.dictation else session)(capture, pos, threading.Event())
+            finally:
+                capture.close()
+            if loader.error is not None:
+                return False
+            if capture.exhausted():
+                pool.jobs.join()        # input files: finish what was recorded
+        else:
+            # Daemon: sessions come and go on `start`/`stop`/`set-device`
+            emit("STATUS: Daemon ready; waiting for start", sys.stderr)
+            while True:
+                running, device, channel, dictating = control.next_session()
+                if not running:
+                    break
+                pos = ring.written
+                capture, error = open_capture(device, channel)
+                if not control.opened(error) and error is not None:
+                    # a restart (set-device, dictation) nobody is waiting on
+                    emit(f"STATUS: Listening stopped: {error}", event='stopped', error=error)
+                if capture is None:
+                    continue
                 try:
-                    decoder.end_utt()
-                    decoder.start_utt()
-                except:
-                    pass
-        
-        decoder.end_utt()
-        
+                    listen_session = dictation_session if dictating else session
+                    interrupted = not listen_session(capture, pos, control.stop)
+                finally:
+                    capture.close()
+                if capture.exhausted():
+                    pool.jobs.join()
+                    control.handle('stop')
+                if control.listening and not interrupted:
+                    emit("STATUS: Reopening audio with the new settings", sys.stderr)
+                else:
+                    emit("STATUS: Listening stopped", event='stopped')
+                if interrupted or loader.error is not None:
+                    break
+            return loader.error is None
+
+    except KeyboardInterrupt:
+        return True
     except Exception as e:
-        print(f"ERROR: Main loop error: {e}", file=sys.stderr)
+        emit(f"ERROR: Main loop error: {e}", sys.stderr)
         return False
-    
+
     finally:
-        try:
-            if 'stream' in locals():
-                stream.close()
-            if 'p' in locals():
-                p.terminate()
-        except:
-            pass
-    
+        if server is not None:
+            server.shutdown()
+        report_capture_stats(ring)
+        if wake_sessions:
+            emit(f"STATUS: Wake latency {summarize_ms(wake_latencies)}", sys.stderr)
+            emit(f"STATUS: Command latency {summarize_ms(command_latencies)}", sys.stderr)
+            emit(f"STATUS: Transcription latency {summarize_ms(pool.latencies)}", sys.stderr)
+            emit(f"STATUS: Transcription queue {pool.report()}", sys.stderr)
+        if dictation is not None and control is None:
+            emit(f"STATUS: Dictation {dictation.report()}", sys.stderr)
+        for backend in backends:
+            if isinstance(backend, ProcessBackend):
+                backend.close()
+        cpu = (time.process_time() - cpu_start) / max(time.monotonic() - wall_start, 1e-9)
+        emit(f"STATUS: Process CPU {cpu:.1%} of one core"
+             + (f"; wake gate {gate.report()}" if gate is not None and wake_sessions else ""),
+             sys.stderr)
+
     return True
 
 def main():
     parser = argparse.ArgumentParser(description='Voice transcription with wake word detection')
     parser.add_argument('--list-devices', action='store_true', help='List available audio devices')
     parser.add_argument('--device', type=int, help='Audio device index to use')
+    parser.add_argument('--capture-rate', type=int,
+                        help="Open the device at this rate (default: its native rate; "
+                             f"{SAMPLE_RATE} leaves resampling to PortAudio)")
+    parser.add_argument('--input-channel', type=int, default=1,
+                        help='Device input channel to use, from 1 (default: the first); '
+                             '0 averages all channels')
+    parser.add_argument('--daemon', action='store_true',
+                        help='Keep models loaded and take list-devices/set-device/start/stop/'
+                             'status/shutdown commands on a local control socket')
+    parser.add_argument('--control-port', type=int, default=0,
+                        help=f'Control socket port on {CONTROL_HOST} with --daemon '
+                             '(default: any free port, printed as CONTROL:<port>)')
+    parser.add_argument('--jsonl', action='store_true',
+                        help='Print every event as a JSON object with a monotonic timestamp')
+    parser.add_argument('--input-wav', action='append',
+                        help='Stream this 16-bit WAV file instead of the microphone (repeatable)')
+    parser.add_argument('--input-dir', help='Stream every WAV file in this directory, by name')
+    parser.add_argument('--realtime', action='store_true',
+                        help='Stream input files at real-time speed (default: as fast as possible)')
+    parser.add_argument('--input-gap', type=float, default=INPUT_GAP_SECONDS,
+                        help='Seconds of silence after each input file')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='Samples per audio chunk; the wake word is checked after each')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='whisper',
+                        help='Speech recognition engine')
+    parser.add_argument('--model', default='base',
+                        help='Model size (tiny, base, small, ...)')
+    parser.add_argument('--model-dir',
+                        help='Local model directory (faster-whisper default: models/faster-whisper-<size>)')
+    parser.add_argument('--quantize', action='store_true',
+                        help='Whisper backend: dynamic int8 quantization of the Linear layers')
+    parser.add_argument('--quantized-cache',
+                        help='Where the quantized model is cached (default ~/.cache/whisper/<size>-int8.pt); '
+                             'rebuilt when whisper, torch or the checkpoint change')
+    parser.add_argument('--no-mmap', dest='mmap', action='store_false',
+                        help='Whisper backend: read weights into memory instead of memory-mapping')
+    parser.add_argument('--short-commands', action='store_true',
+                        help='Whisper backend: encode only the command window, greedy decoding')
+    parser.add_argument('--max-tokens', type=int, default=WhisperBackend.SHORT_MAX_TOKENS,
+                        help='Token budget per command with --short-commands')
+    parser.add_argument('--no-gate', dest='gate', action='store_false',
+                        help='Decode the wake word on every chunk, even in silence')
+    parser.add_argument('--no-commands', dest='commands', action='store_false',
+                        help='Send every command to Whisper instead of spotting known ones first')
+    parser.add_argument('--command-window', type=float, default=COMMAND_WINDOW_SECONDS,
+                        help='Seconds after the wake word in which known commands are spotted')
+    parser.add_argument('--vocab',
+                        help='Vocabulary file (commands.tsv or one entry per line) to bias decoding')
+    parser.add_argument('--vocab-bias', type=float, default=WhisperBackend.VOCAB_BIAS,
+                        help='Logit boost for vocabulary tokens with --short-commands (0 = off)')
+    parser.add_argument('--snap-distance', type=float, default=SNAP_DISTANCE,
+                        help='Snap transcriptions within this share of edits to a vocabulary entry (0 = off)')
+    parser.add_argument('--dictation', action='store_true',
+                        help='Transcribe everything said, without the wake word (PARTIAL:/FINAL: lines)')
+    parser.add_argument('--dictation-step', type=float, default=DICTATION_STEP_SECONDS,
+                        help='Seconds of new audio between decodes of an open dictated phrase')
+    parser.add_argument('--dictation-budget', type=float, default=DICTATION_CPU_BUDGET,
+                        help='Share of one core partial dictation decodes may use at real time '
+                             f'(final decodes, at most {DICTATION_MAX_SECONDS} s of audio each, '
+                             'are not delayed)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Transcription workers, each with its own copy of the model')
+    parser.add_argument('--worker-processes', action='store_true',
+                        help='Run each worker in its own process instead of a thread')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE,
+                        help='Utterances that may wait for a worker before one is dropped')
+    parser.add_argument('--queue-policy', choices=TranscriptionPool.POLICIES, default=QUEUE_POLICY,
+                        help='Which utterance to drop when the queue is full')
+    parser.add_argument('--torch-threads', type=int, default=0,
+                        help='Decoder threads per worker (0 = half the cores, split over workers). '
+                             "torch's thread count is per process, so whisper workers in threads "
+                             'share one pool of this size; it is set once per process')
+    parser.add_argument('--warmup-runs', type=int, default=WARMUP_RUNS,
+                        help='Synthetic transcriptions before READY (first is cold; 0 = none)')
+    parser.add_argument('--no-vad', dest='vad', action='store_false',
+                        help=f'Record a fixed {RECORD_SECONDS}s window instead of endpointing')
+    parser.add_argument('--vad-silence', type=float, default=VAD_SILENCE_SECONDS,
+                        help='Seconds of silence that end a command')
+    parser.add_argument('--min-record', type=float, default=MIN_RECORD_SECONDS,
+                        help='Minimum command length in seconds')
+    parser.add_argument('--max-record', type=float, default=MAX_RECORD_SECONDS,
+                        help='Maximum command length in seconds')
     
     args = parser.parse_args()
-    
+
+    global _jsonl
+    _jsonl = args.jsonl
+    if args.input_channel < 0:
+        parser.error("--input-channel counts from 1 (0 = all channels)")
+    args.input_channel = args.input_channel - 1 if args.input_channel else None
+    if args.workers < 1 or args.queue_size < 1:
+        parser.error("--workers and --queue-size must be at least 1")
+
     if args.list_devices:
         # Only list devices - don't load Whisper/heavy components
         list_audio_devices()
         return
     else:
-        print("STATUS: Voice transcription system starting...")
-        run_transcription(args.device)
+        emit("STATUS: Voice transcription system starting...")
+        run_transcription(args)
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()    # worker processes in frozen builds
     main()
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""
+Channel mixing and streaming polyphase resampling to the 16 kHz the
+recognizers expect.
+
+Pro interfaces often only run at 44.1 or 48 kHz with several inputs, so
+capture opens them at their native format and converts here, a whole
+block at a time in numpy. Resampling by up/down (160/441 for 44.1 kHz,
+1/3 for 48 kHz) uses a Kaiser-windowed sinc split into `up` phases of
+`taps` coefficients; each output sample is one dot product with the
+input window it falls in. The sinc keeps ZERO_CROSSINGS lobes on each
+side at the output rate, so the more the input is decimated, the more
+taps. State is carried between blocks, so a stream
+converted block by block matches converting it in one go.
+
+Run benchmark_resampler.py to check the CPU cost at the capture chunk sizes.
+"""
+
+from math import ceil, gcd
+
+import numpy as np
+
+ZERO_CROSSINGS = 8  # sinc lobes kept on each side of the centre
+ROLLOFF = 0.9       # cutoff as a share of the output Nyquist frequency
+KAISER_BETA = 8.0   # ~80 dB stopband
+
+
+def to_mono(block, channels, channel=None):
+    """
+    Mono float32 from interleaved samples: one `channel` (0-based), or the
+    mean of all channels when channel is None.
+    """
+    frames = np.asarray(block, dtype=np.float32).reshape(-1, channels)
+    if channel is not None:
+        return frames[:, channel]
+    return frames[:, 0] if channels == 1 else frames.mean(axis=1)
+
+
+def filter_taps(up, down, zero_crossings=ZERO_CROSSINGS):
+    """Filter length per phase, in input samples"""
+    return ceil(2 * zero_crossings * max(1.0, down / up))
+
+
+def design_filter(up, down, taps, rolloff=ROLLOFF, beta=KAISER_BETA):
+    """Low-pass prototype at the upsampled rate, `up * taps` coefficients long"""
+    n = up * taps
+    cutoff = rolloff * 0.5 / max(up, down)     # cycles per upsampled sample
+    t = np.arange(n) - (n - 1) / 2
+    return 2 * cutoff * np.sinc(2 * cutoff * t) * np.kaiser(n, beta) * up
+
+
+class Resampler:
+    """
+    Streaming resampler from in_rate to out_rate for mono blocks.
+
+    process() takes any number of input samples and returns the output
+    samples they complete; int16 in gives int16 out, clipped.
+    """
+
+    def __init__(self, in_rate, out_rate, zero_crossings=ZERO_CROSSINGS):
+        g = gcd(int(in_rate), int(out_rate))
+        self.in_rate, self.out_rate = in_rate, out_rate
+        self.up, self.down = int(out_rate) // g, int(in_rate) // g
+        self.taps = taps = filter_taps(self.up, self.down, zero_crossings)
+        h = design_filter(self.up, self.down, taps)
+        # bank[p, m] weights window sample m (oldest first) for phase p
+        self.bank = h.reshape(taps, self.up).T[:, ::-1].astype(np.float32).copy()
+        self.reset()
+
+    def reset(self):
+        self.history = np.zeros(self.taps - 1, dtype=np.float32)
+        self.next_out = (self.taps - 1) * self.up   # upsampled time of the next output
+
+    @property
+    def delay(self):
+        """Group delay in input samples"""
+        return (self.taps * self.up - 1) / 2 / self.up
+
+    def process(self, block):
+        is_int16 = np.asarray(block).dtype == np.int16
+        if len(block) == 0:
+            return np.zeros(0, dtype=np.int16 if is_int16 else np.float32)
+        x = np.concatenate((self.history, np.asarray(block, dtype=np.float32)))
+        n = len(x)
+
+        # upsampled times of the outputs whose newest input is in x
+        times = np.arange(self.next_out, n * self.up, self.down)
+        newest, phase = np.divmod(times, self.up)
+        windows = np.lib.stride_tricks.sliding_window_view(x, self.taps)
+        if self.up == 1:
+            # integer decimation: one phase, evenly spaced windows
+            first = self.next_out - (self.taps - 1)
+            y = windows[first:first + len(times) * self.down:self.down] @ self.bank[0]
+        else:
+            y = np.einsum('ij,ij->i', windows[newest - (self.taps - 1)], self.bank[phase])
+
+        keep = n - (self.taps - 1)
+        self.history = x[keep:].copy()
+        self.next_out = (self.next_out + len(times) * self.down) - keep * self.up
+
+        if is_int16:
+            return np.clip(np.rint(y), -32768, 32767).astype(np.int16)
+        return y.astype(np.float32)
+
+
+class InputConverter:
+    """
+    Interleaved int16 blocks at a device's native format -> 16-bit mono
+    blocks at `out_rate`: channel select or downmix, then resampling.
+    Passes blocks straight through when the device already is mono at
+    out_rate.
+    """
+
+    def __init__(self, in_rate, channels, out_rate, channel=None, zero_crossings=ZERO_CROSSINGS):
+        if channel is not None and not 0 <= channel < channels:
+            raise ValueError(f"channel {channel + 1} out of range (device has {channels})")
+        self.in_rate, self.channels, self.channel = int(in_rate), channels, channel
+        self.resampler = None
+        if int(in_rate) != out_rate:
+            self.resampler = Resampler(in_rate, out_rate, zero_crossings)
+
+    @property
+    def passthrough(self):
+        return self.resampler is None and self.channels == 1
+
+    def process(self, block):
+        if self.passthrough:
+            return block
+        out = to_mono(block, self.channels, self.channel)
+        if self.resampler is not None:
+            out = self.resampler.process(out)
+        return np.clip(np.rint(out), -32768, 32767).astype(np.int16)
+
+    def describe(self):
+        mix = (f"channel {self.channel + 1}" if self.channel is not None
+               else "mono" if self.channels == 1 else f"downmix of {self.channels} channels")
+        rate = (f"{self.in_rate} Hz" if self.resampler is None
+                else f"{self.in_rate} Hz resampled {self.resampler.up}/{self.resampler.down}")
+        return f"{rate}, {mix}"
@@ -0,0 +1,360 @@
+"""
+Tune the wake word threshold, or the command vocabulary thresholds, on
+labelled recordings.
+
+Runs the keyphrase search over every clip once per threshold, the same
+way the transcriber does: chunk by chunk (--chunk-size, as given to the
+transcriber), behind the same energy gate (WakeGate; --no-gate if the
+transcriber runs with --no-gate) and restarting after a detection. Each
+clip starts with a fresh gate, as after a start. It prints the DET curve: false reject rate over positive clips against
+false accepts per hour of negative audio. The clip directory uses the
+benchmark_pipeline.py manifest: clips with a label contain the wake word,
+clips labelled `-` don't.
+
+The chosen threshold is the one with the fewest false rejects that stays
+within --max-fa-per-hour. It is written into keywords.kws, which the
+transcriber and keyphrase_test.py read. False accepts per hour need
+negative audio, so without negative clips nothing is chosen or written.
+
+With --commands it tunes commands.kws instead. A command hit skips
+Whisper, so a false or wrong hit loads the wrong device. The per-phrase
+thresholds come from make_command_vocab.py's phone count rule; this
+sweeps its PHONE_EXPONENT. Each positive clip is cut to the command
+window (--command-window) after its wake word, as the transcriber does,
+and its label must be the device name or the spoken phrase. Negative
+audio is cut into windows that are each treated as if a wake word came
+just before, so its false hits per hour are a worst case. The chosen
+exponent has the fewest wrong commands, then the fewest misses (those
+fall back to Whisper), within --max-fa-per-hour; it is written into
+commands.kws. Pass the same --phone-exponent to make_command_vocab.py
+when the vocabulary is regenerated.
+
+    python tune_kws_threshold.py --clips clips/
+    python tune_kws_threshold.py --clips clips/ --max-fa-per-hour 0.5 --plot det.png
+    python tune_kws_threshold.py --clips clips/ --dry-run
+    python tune_kws_threshold.py --clips clips/ --commands
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+
+from benchmark_pipeline import read_manifest
+from make_command_vocab import BASE_PHONES, count_phones, read_cmudict, threshold_exponent, write_kws
+from realtime_transcribe import (CHUNK_SIZE, COMMAND_WINDOW_SECONDS, SAMPLE_RATE, CommandSpotter,
+                                 WakeGate, WakeWordSpotter, load_commands, read_wav)
+from vocabulary import normalize
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+KEYWORDS = os.path.join(HERE, 'keywords.kws')
+COMMANDS = os.path.join(HERE, 'commands.kws')
+
+
+def read_keyphrase(path):
+    """(phrase, threshold exponent) of the first line of a keyword file"""
+    with open(path, encoding='utf-8') as f:
+        line = f.readline().strip()
+    phrase, _, threshold = line.partition('/')
+    return phrase.strip(), threshold.strip('/ ')
+
+
+def write_keyphrase(path, phrase, exponent):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"{phrase} /1e-{exponent}/\n")
+
+
+def count_detections(decoder, audio, phrase, chunk_size=CHUNK_SIZE, gate=None):
+    """Detections of `phrase` in `audio`; chunks the gate skips are not decoded"""
+    spotter = WakeWordSpotter(decoder)
+    spotter.restart(0)
+    detections = 0
+    for start in range(0, len(audio), chunk_size):
+        samples = audio[start:start + chunk_size]
+        end = start + len(samples)
+        feed_from = start if gate is None else gate.update(end, samples)
+        if feed_from is None:
+            continue
+        if gate is not None and gate.just_opened:
+            spotter.restart(feed_from)
+            if feed_from < start:
+                spotter.process(audio[feed_from:start])
+        spotter.process(samples)
+        hyp = spotter.hypothesis()
+        if hyp is not None:
+            detections += phrase in hyp
+            spotter.restart(end)
+    spotter.stop()
+    return detections
+
+
+def sweep(clips, phrase, exponents, hmm, dictionary, chunk_size=CHUNK_SIZE, gated=True):
+    from pocketsphinx import Config, Decoder
+
+    audio = [(read_wav(path), expected is not None) for path, expected in clips]
+    negative_hours = sum(len(a) for a, positive in audio if not positive) / SAMPLE_RATE / 3600
+    positives = sum(positive for _, positive in audio)
+
+    rows = []
+    for exponent in exponents:
+        decoder = Decoder(Config(hmm=hmm, dict=dictionary, keyphrase=phrase,
+                                 kws_threshold=float(f"1e-{exponent}"), loglevel='ERROR'))
+        misses = false_accepts = 0
+        for samples, positive in audio:
+            n = count_detections(decoder, samples, phrase, chunk_size,
+                                 WakeGate() if gated else None)
+            if positive:
+                misses += n == 0
+                false_accepts += max(0, n - 1)
+            else:
+                false_accepts += n
+        rows.append({
+            'exponent': exponent,
+            'false reject %': misses / max(positives, 1) * 100,
+            'false accepts': false_accepts,
+            'FA / h': false_accepts / negative_hours if negative_hours else float('nan'),
+        })
+        print(f"  1e-{exponent:<4} FR {rows[-1]['false reject %']:6.1f} %   "
+              f"FA {false_accepts:4d} ({rows[-1]['FA / h']:.2f}/h)", file=sys.stderr)
+    return rows, negative_hours
+
+
+def wake_end(decoder, audio, chunk_size=CHUNK_SIZE):
+    """Sample position just after the first wake word in audio, or None"""
+    spotter = WakeWordSpotter(decoder)
+    spotter.restart(0)
+    for start in range(0, len(audio), chunk_size):
+        spotter.process(audio[start:start + chunk_size])
+        if spotter.hypothesis() is not None:
+            end = spotter.keyphrase_end()
+            spotter.stop()
+            return min(start + chunk_size, len(audio)) if end is None else end
+    spotter.stop()
+    return None
+
+
+def spot_command(spotter, audio, chunk_size=CHUNK_SIZE):
+    """(phrase, device name) the command spotter settles on in audio, or None"""
+    spotter.restart(0)
+    for start in range(0, len(audio), chunk_size):
+        spotter.process(audio[start:start + chunk_size])
+        if spotter.detect() is not None:
+            break
+    best = spotter.best
+    spotter.stop()
+    return None if best is None else (best, spotter.commands[best][1])
+
+
+def command_windows(clips, wake_decoder, window, chunk_size=CHUNK_SIZE):
+    """([(window after the wake word, expected)], [negative windows], clips without a wake)"""
+    positives, negatives, unwoken = [], [], 0
+    for path, expected in clips:
+        audio = read_wav(path)
+        if expected is None:
+            negatives += [audio[i:i + window] for i in range(0, len(audio), window)]
+            continue
+        end = wake_end(wake_decoder, audio, chunk_size)
+        if end is None:
+            unwoken += 1
+        else:
+            positives.append((audio[end:end + window], expected))
+    return positives, negatives, unwoken
+
+
+def sweep_commands(clips, phone_exponents, hmm, dictionary, keywords, commands_tsv,
+                   commands_dict, window_seconds=COMMAND_WINDOW_SECONDS,
+                   base_phones=BASE_PHONES, chunk_size=CHUNK_SIZE):
+    from pocketsphinx import Config, Decoder
+
+    commands = load_commands(commands_tsv)
+    pronunciations = read_cmudict(commands_dict)
+    phones = {phrase: count_phones(phrase, pronunciations) for phrase in commands}
+
+    wake_decoder = Decoder(Config(hmm=hmm, dict=dictionary, kws=keywords, loglevel='ERROR'))
+    window = int(window_seconds * SAMPLE_RATE)
+    positives, negatives, unwoken = command_windows(clips, wake_decoder, window, chunk_size)
+    negative_hours = sum(len(a) for a in negatives) / SAMPLE_RATE / 3600
+    if not positives:
+        sys.exit("No positive clip has a wake word detection, so there are no commands to score")
+    if unwoken:
+        print(f"  {unwoken} positive clips without a wake word detection are left out",
+              file=sys.stderr)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        kws = os.path.join(tmp, 'commands.kws')
+        for phone_exponent in phone_exponents:
+            write_kws(kws, [(phrase, threshold_exponent(n, phone_exponent, base_phones))
+                            for phrase, n in phones.items()])
+            spotter = CommandSpotter(
+                Decoder(Config(hmm=hmm, dict=commands_dict, kws=kws, loglevel='ERROR')),
+                commands, window_seconds)
+            wrong = misses = false_accepts = 0
+            for audio, expected in positives:
+                hit = spot_command(spotter, audio, chunk_size)
+                if hit is None:
+                    misses += 1
+                elif normalize(expected) not in (normalize(hit[0]), normalize(hit[1])):
+                    wrong += 1
+            for audio in negatives:
+                false_accepts += spot_command(spotter, audio, chunk_size) is not None
+            rows.append({
+                'phone exponent': phone_exponent,
+                'wrong %': wrong / max(len(positives), 1) * 100,
+                'miss %': misses / max(len(positives), 1) * 100,
+                'false accepts': false_accepts,
+                'FA / h': false_accepts / negative_hours if negative_hours else float('nan'),
+            })
+            print(f"  {phone_exponent:<5g} wrong {rows[-1]['wrong %']:6.1f} %   "
+                  f"miss {rows[-1]['miss %']:6.1f} %   "
+                  f"FA {false_accepts:4d} ({rows[-1]['FA / h']:.2f}/h)", file=sys.stderr)
+    return rows, negative_hours, phones
+
+
+def choose_commands(rows, max_fa_per_hour):
+    """Fewest wrong commands, then fewest misses, within the FA budget; ties go stricter"""
+    ok = [r for r in rows if r['FA / h'] <= max_fa_per_hour]
+    if not ok:
+        return min(rows, key=lambda r: (r['FA / h'], r['wrong %'], r['miss %'])), False
+    return min(ok, key=lambda r: (r['wrong %'], r['miss %'], r['phone exponent'])), True
+
+
+def choose(rows, max_fa_per_hour):
+    """Fewest false rejects within the FA budget; ties go to the stricter threshold"""
+    ok = [r for r in rows if r['FA / h'] <= max_fa_per_hour]
+    if not ok:
+        return min(rows, key=lambda r: (r['FA / h'], r['false reject %'])), False
+    return min(ok, key=lambda r: (r['false reject %'], r['exponent'])), True
+
+
+def plot(rows, path):
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping the plot", file=sys.stderr)
+        return
+    fig, ax = plt.subplots()
+    ax.plot([r['FA / h'] for r in rows], [r['false reject %'] for r in rows], marker='o')
+    for r in rows:
+        ax.annotate(f"1e-{r['exponent']}", (r['FA / h'], r['false reject %']), fontsize=7)
+    ax.set_xlabel('false accepts per hour')
+    ax.set_ylabel('false reject %')
+    ax.set_title('Wake word DET curve')
+    ax.grid(True)
+    fig.savefig(path)
+
+
+def parse_exponents(spec):
+    """'1:40' or '1:40:2' or '1,5,10'"""
+    if ':' in spec:
+        parts = [int(p) for p in spec.split(':')]
+        return list(range(parts[0], parts[1] + 1, parts[2] if len(parts) > 2 else 1))
+    return [int(p) for p in spec.split(',')]
+
+
+def parse_phone_exponents(spec):
+    """'0.5:4:0.5' or '1,1.5,2'"""
+    if ':' in spec:
+        parts = [float(p) for p in spec.split(':')]
+        step = parts[2] if len(parts) > 2 else 0.5
+        count = int(round((parts[1] - parts[0]) / step)) + 1
+        return [round(parts[0] + i * step, 6) for i in range(count)]
+    return [float(p) for p in spec.split(',')]
+
+
+def tune_commands(args, clips):
+    print(f"Sweeping the command vocabulary over {len(clips)} clips", file=sys.stderr)
+    rows, negative_hours, phones = sweep_commands(
+        clips, parse_phone_exponents(args.phone_exponents), args.hmm, args.dict,
+        args.keywords, args.commands_tsv, args.commands_dict, args.command_window,
+        args.base_phones, args.chunk_size)
+
+    print(f"{'phone exponent':>14}  {'wrong %':>7}  {'miss %':>6}  {'false accepts':>13}  {'FA / h':>8}")
+    for r in rows:
+        print(f"{r['phone exponent']:14g}  {r['wrong %']:7.1f}  {r['miss %']:6.1f}  "
+              f"{r['false accepts']:13d}  {r['FA / h']:8.2f}")
+    if negative_hours <= 0:
+        sys.exit(f"The negative clips hold no audio: false accepts can't be measured, "
+                 f"so {args.commands_kws} is left unchanged")
+
+    best, within_budget = choose_commands(rows, args.max_fa_per_hour)
+    if not within_budget:
+        print(f"No phone exponent stays within {args.max_fa_per_hour} FA/h; "
+              f"using the one with the fewest false accepts", file=sys.stderr)
+    print(f"Chosen: phone exponent {best['phone exponent']:g} (wrong {best['wrong %']:.1f} %, "
+          f"miss {best['miss %']:.1f} %, {best['FA / h']:.2f} FA/h)")
+    if not args.dry_run:
+        write_kws(args.commands_kws,
+                  [(phrase, threshold_exponent(n, best['phone exponent'], args.base_phones))
+                   for phrase, n in phones.items()])
+        print(f"Wrote {args.commands_kws}; pass --phone-exponent {best['phone exponent']:g} "
+              f"to make_command_vocab.py when regenerating it")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune the wake word or command thresholds')
+    parser.add_argument('--clips', required=True, help='Directory with WAV files and manifest.tsv')
+    parser.add_argument('--keywords', default=KEYWORDS, help='Keyword file to read and update')
+    parser.add_argument('--exponents', default='1:40',
+                        help='Thresholds to try as 1e-N exponents: first:last[:step] or a list')
+    parser.add_argument('--max-fa-per-hour', type=float, default=1.0)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='Samples per decoder call, as given to the transcriber')
+    parser.add_argument('--no-gate', dest='gate', action='store_false',
+                        help='Decode every chunk, for a transcriber run with --no-gate')
+    parser.add_argument('--hmm', default=os.path.join(HERE, 'en-us'))
+    parser.add_argument('--dict', default=os.path.join(HERE, 'dictionary.dict'))
+    parser.add_argument('--plot', help='Save the DET curve to this image (needs matplotlib)')
+    parser.add_argument('--dry-run', action='store_true', help="Don't update the keyword file")
+    commands = parser.add_argument_group('command vocabulary (--commands)')
+    commands.add_argument('--commands', action='store_true',
+                          help='Tune commands.kws instead of the wake word')
+    commands.add_argument('--phone-exponents', default='0.5:4:0.5',
+                          help='PHONE_EXPONENT values to try: first:last[:step] or a list')
+    commands.add_argument('--base-phones', type=int, default=BASE_PHONES)
+    commands.add_argument('--command-window', type=float, default=COMMAND_WINDOW_SECONDS,
+                          help='Seconds after the wake word, as given to the transcriber')
+    commands.add_argument('--commands-kws', default=COMMANDS, help='Command keyword file to update')
+    commands.add_argument('--commands-tsv', default=os.path.join(HERE, 'commands.tsv'))
+    commands.add_argument('--commands-dict', default=os.path.join(HERE, 'commands.dict'))
+    args = parser.parse_args()
+
+    clips = read_manifest(args.clips)
+    if not any(expected is None for _, expected in clips):
+        sys.exit("No negative clips (labelled -) in the manifest: false accepts can't be "
+                 "measured, so no threshold can be chosen")
+    if args.commands:
+        tune_commands(args, clips)
+        return
+
+    phrase, current = read_keyphrase(args.keywords)
+    print(f"Sweeping '{phrase}' over {len(clips)} clips (current threshold {current})",
+          file=sys.stderr)
+    rows, negative_hours = sweep(clips, phrase, parse_exponents(args.exponents),
+                                 args.hmm, args.dict, args.chunk_size, args.gate)
+
+    print(f"{'threshold':>10}  {'false reject %':>14}  {'false accepts':>13}  {'FA / h':>8}")
+    for r in rows:
+        print(f"{'1e-' + str(r['exponent']):>10}  {r['false reject %']:14.1f}  "
+              f"{r['false accepts']:13d}  {r['FA / h']:8.2f}")
+    if args.plot:
+        plot(rows, args.plot)
+    if negative_hours <= 0:
+        sys.exit(f"The negative clips hold no audio: false accepts can't be measured, "
+                 f"so {args.keywords} is left unchanged")
+
+    best, within_budget = choose(rows, args.max_fa_per_hour)
+    if not within_budget:
+        print(f"No threshold stays within {args.max_fa_per_hour} FA/h; "
+              f"using the one with the fewest false accepts", file=sys.stderr)
+    print(f"Chosen: 1e-{best['exponent']} (false reject {best['false reject %']:.1f} %, "
+          f"{best['FA / h']:.2f} FA/h)")
+    if not args.dry_run:
+        write_keyphrase(args.keywords, phrase, best['exponent'])
+        print(f"Wrote {args.keywords}")
+
+
+if __name__ == "__main__":
+    main()
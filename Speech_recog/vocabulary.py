@@ -0,0 +1,81 @@
+"""
+Command vocabulary for biasing and correcting transcriptions.
+
+A vocabulary file is either commands.tsv from make_command_vocab.py
+(device names; utility commands by their spoken phrase) or plain text
+with one entry per line and `#` comments.
+
+The vocabulary is used in three ways:
+- prompt(): an initial prompt listing the entries, so Whisper expects
+  these spellings;
+- token_sequences(): entries as token ids, for logit boosting in the
+  Whisper short-command decoder;
+- snap(): a transcription within a small edit distance of an entry is
+  replaced by that entry ("glue compresser" -> "Glue Compressor").
+"""
+
+import re
+
+SNAP_DISTANCE = 0.3     # max edits as a share of the entry length
+
+
+def edit_distance(a, b):
+    """Levenshtein distance between two sequences (strings or token lists)"""
+    row = list(range(len(b) + 1))
+    for i, x in enumerate(a, 1):
+        prev, row[0] = row[0], i
+        for j, y in enumerate(b, 1):
+            prev, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, prev + (x != y))
+    return row[-1]
+
+
+def normalize(text):
+    return ' '.join(re.sub(r"[^a-z0-9' ]+", " ", text.lower()).split())
+
+
+class Vocabulary:
+    def __init__(self, entries, snap_distance=SNAP_DISTANCE):
+        self.entries = list(dict.fromkeys(e for e in entries if e))
+        self.snap_distance = snap_distance
+        self._normalized = [(normalize(e), e) for e in self.entries]
+        self._longest = max((len(n) for n, _ in self._normalized), default=0)
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                fields = line.split('\t')
+                if len(fields) == 3:
+                    _, name, phrase = fields
+                    entries.append(phrase if name.startswith('__') else name)
+                else:
+                    entries.append(fields[0])
+        return cls(entries, **kwargs)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def prompt(self):
+        return ", ".join(self.entries) + "."
+
+    def token_sequences(self, encode):
+        """Token id sequences for each entry as Whisper may start a transcript with it"""
+        sequences = set()
+        for entry in self.entries:
+            for variant in {entry, entry.lower(), entry[:1].upper() + entry[1:].lower()}:
+                sequences.add(tuple(encode(" " + variant)))
+        return sorted(sequences)
+
+    def snap(self, text):
+        """The closest entry if text is within snap_distance of it, else text"""
+        norm = normalize(text)
+        if not norm or self.snap_distance <= 0 or len(norm) > 2 * self._longest:
+            return text
+        best, entry = min((edit_distance(norm, n), e) for n, e in self._normalized)
+        if best <= self.snap_distance * len(normalize(entry)):
+            return entry
+        return text
@@ -16,6 +16,10 @@ a = Analysis(
     datas=[
         ('en-us', 'en-us'),
         ('dictionary.dict', '.'),
+        ('keywords.kws', '.'),
+        ('commands.tsv', '.'),
+        ('commands.kws', '.'),
+        ('commands.dict', '.'),
         (whisper_assets, 'whisper/assets'),  # Include Whisper assets
     ],
     hiddenimports=[
@@ -50,24 +54,33 @@ a = Analysis(
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
 
+# One-folder build: a one-file exe unpacks torch to a temp dir on every
+# launch, which made each `--list-devices` scan take seconds.
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='whisper_transcriber',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
     upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
     target_arch=None,
     codesign_identity=None,
     entitlements_file=None,
-)
\ No newline at end of file
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    name='whisper_transcriber',
+)
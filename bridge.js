@@ -15,6 +15,18 @@ oscServer.on('message', (msg) => {
   Max.outlet(msg[0], msg[1]);
 });
 
+// --- TRACKER CONTROL PORT ---
+// The tracker listens here for pause/resume/shutdown/ping, so we can idle it
+// instead of killing it and paying for a model reload on the next start.
+const CONTROL_PORT = 8002;
+const controlClient = new osc.Client(OSC_IP, CONTROL_PORT);
+
+function sendControl(command) {
+  controlClient.send(`/face/control/${command}`, (err) => {
+    if (err) Max.error(`-> Failed to send '${command}' to tracker: ${err.message}`);
+  });
+}
+
 // --- EXECUTABLE PROCESS MANAGEMENT ---
 const wrapperScript = 'run_face_tracker.sh';
 const executablePath = path.join(__dirname, wrapperScript);
@@ -54,18 +66,38 @@ Max.addHandler('test', () => {
     Max.outlet("this is a test message");
 });
 
+// Pause keeps the model loaded; the tracker answers with /face/status paused
+Max.addHandler('pause_process', () => {
+    Max.post(`Pausing face tracker...`);
+    sendControl('pause');
+});
+
+Max.addHandler('resume_process', () => {
+    Max.post(`Resuming face tracker...`);
+    sendControl('resume');
+});
+
+// The tracker answers with /face/pong <running|paused>
+Max.addHandler('ping_process', () => {
+    sendControl('ping');
+});
+
 // This handler is triggered by a [closebang] in the Max patch
 Max.addHandler('stop_process', () => {
     Max.post(`Stopping background process...`);
+    // Ask the tracker to shut down cleanly first so it releases the camera.
+    sendControl('shutdown');
+
     // Since the process is detached, we can't call .kill().
-    // We must kill it by name using a system command.
+    // If it didn't exit, kill it by name using a system command.
     const appName = 'MediaPipe_Facial_Feature_OSC_Out';
-    
-    if (process.platform === 'win32') {
-        exec(`taskkill /F /IM ${appName}.exe`);
-    } else {
-        // Use pkill to find and kill the process by its name
-        exec(`pkill -f ${appName}`);
-    }
-    Max.post(`-> Kill signal sent to all processes named '${appName}'.`);
+    setTimeout(() => {
+        if (process.platform === 'win32') {
+            exec(`taskkill /F /IM ${appName}.exe`);
+        } else {
+            // Use pkill to find and kill the process by its name
+            exec(`pkill -f ${appName}`);
+        }
+        Max.post(`-> Kill signal sent to all processes named '${appName}'.`);
+    }, 1000);
 });
\ No newline at end of file
@@ -4,13 +4,22 @@ Expression-controlled OSC + Syphon streamer with normalized eye/mouth coords
 ──────────────────────────────────────────────────────────────────────────
 • webcam → MediaPipe Face Landmarker (blend-shapes + face center + pose)
 • exponential-moving-average smoothing
-• OSC out, one message per label
+• OSC out, one message per label, at a fixed rate with interpolation
 • Packaged for dependency-free distribution with PyInstaller
 • Includes robust error handling in the main loop to prevent crashes.
+• Reopens the webcam after USB drop-outs without rebuilding the model.
+• OSC control port (pause / resume / shutdown / ping) keeps the model loaded.
+• Optional quantised binary frames (face_frame_codec) for remote links.
+• Optional debug preview (window or file), rendered off the inference thread.
 """
 
 import os
 import sys
+import time
+import socket
+import argparse
+import tempfile
+import threading
 import urllib.request
 import cv2
 import numpy as np
@@ -18,6 +27,8 @@ import mediapipe as mp
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
 from pythonosc import udp_client
+from face_frame_codec import FrameEncoder, FrameDecoder
+from face_runtime import CameraSource, FakeCamera, TrackerControl
 
 # Helper function to find bundled resources
 def get_resource_path(relative_path):
@@ -55,14 +66,119 @@ ALPHA_TRACK   = 0.6
 
 OSC_IP        = "127.0.0.1"
 OSC_PORT      = 8001
+CONTROL_PORT  = 8002
 WEBCAM_INDEX  = 0
 
+# fixed-rate output (0 = send once per inference frame). A rate above the
+# inference rate multiplies the OSC traffic and adds OUTPUT_DELAY_S of lag.
+OUTPUT_RATE_HZ    = 0
+OUTPUT_DELAY_S    = 1 / 30   # render one frame behind so we mostly interpolate
+MAX_EXTRAPOLATE_S = 0.1      # stop sending once the newest frame is this old
+OVERRUN_REPORT_S  = 5.0
+
+# binary frame output (see face_frame_codec.py)
+BINARY_DTYPE       = "uint8"
+BINARY_TABLE_EVERY = 30     # resend the quantisation table every N frames
+
+# debug preview
+PREVIEW_MAX_FPS = 10
+PREVIEW_WIDTH   = 320
+PREVIEW_FILE    = os.path.join(tempfile.gettempdir(), "face_preview.jpg")
+
 # landmark indices for eye corners and mouth corners
 LE_OUTER, LE_INNER = 33, 133
 RE_INNER, RE_OUTER = 362, 263
 MO_LEFT, MO_RIGHT = 61, 291
+
+# one OSC address per slot of the feature vector, in send order
+FEATURE_ADDRESSES = (
+    [f"/face/{name}" for name in TARGETS]
+    + ["/face/center/x", "/face/center/y", "/face/center/z"]
+    + ["/face/pose/yaw", "/face/pose/pitch", "/face/pose/roll"]
+    + ["/face/eye/left/x", "/face/eye/left/y"]
+    + ["/face/eye/right/x", "/face/eye/right/y"]
+    + ["/face/mouth/x", "/face/mouth/y"]
+)
+
+# (lo, hi) per feature slot, used to quantise the binary frames
+FEATURE_RANGES = (
+    [(0.0, 1.0)] * len(TARGETS)
+    + [(0.0, 1.0), (0.0, 1.0), (-0.5, 0.5)]
+    + [(-180.0, 180.0)] * 3
+    + [(0.0, 1.0)] * 6
+)
+
+# slots holding angles in degrees, interpolated the short way round
+ANGLE_SLOTS = [i for i, address in enumerate(FEATURE_ADDRESSES)
+               if address.startswith("/face/pose/")]
 # ─────────────────────────────────────────────────────────────
 
+parser = argparse.ArgumentParser(description="Face tracker streaming OSC features")
+parser.add_argument("--output-rate", type=float, default=OUTPUT_RATE_HZ,
+                    help="fixed OSC output rate in Hz (0 = once per inference frame)")
+parser.add_argument("--output-delay", type=float, default=OUTPUT_DELAY_S,
+                    help="seconds the output lags the newest frame to allow interpolation")
+parser.add_argument("--control-port", type=int, default=CONTROL_PORT,
+                    help="UDP port for /face/control/* messages (0 = disabled)")
+parser.add_argument("--pause-release-camera", action="store_true",
+                    help="close the webcam while paused (slower resume, camera light off)")
+parser.add_argument("--binary-target", metavar="HOST:PORT",
+                    help="also send quantised binary frames to this UDP address, "
+                         "one per inference frame")
+parser.add_argument("--binary-dtype", choices=["uint8", "int16"], default=BINARY_DTYPE,
+                    help="quantisation of the binary frames")
+parser.add_argument("--measure-encoding", action="store_true",
+                    help="print bytes/frame of OSC vs binary output and exit")
+parser.add_argument("--preview", action="store_true",
+                    help="show an annotated preview window")
+parser.add_argument("--preview-file", nargs="?", const=PREVIEW_FILE,
+                    help=f"write the preview to an image file instead (default {PREVIEW_FILE})")
+parser.add_argument("--preview-fps", type=float, default=PREVIEW_MAX_FPS,
+                    help="maximum preview refresh rate")
+parser.add_argument("--fake-camera", action="store_true",
+                    help="use a synthetic capture source that drops out on purpose")
+parser.add_argument("--fake-fail-every", type=int, default=150,
+                    help="fake camera: frames delivered between drop-outs")
+parser.add_argument("--fake-outage", type=float, default=2.0,
+                    help="fake camera: seconds each drop-out lasts")
+# parse_known_args: the .app bundle may be launched with extra system arguments
+args, _ = parser.parse_known_args()
+
+def measure_encoding(frames=300):
+    """Print bytes per frame of the per-value OSC output against binary frames."""
+    from pythonosc.osc_message_builder import OscMessageBuilder
+
+    lo, hi = np.array(FEATURE_RANGES, dtype=np.float32).T
+    samples = np.random.default_rng(0).uniform(lo, hi, size=(frames, len(lo)))
+
+    osc_bytes = 0
+    for address in FEATURE_ADDRESSES:
+        builder = OscMessageBuilder(address=address)
+        builder.add_arg(0.5)
+        osc_bytes += len(builder.build().dgram)
+    rows = [("OSC float per message", len(FEATURE_ADDRESSES), osc_bytes, 0.0)]
+
+    for dtype in ("uint8", "int16"):
+        encoder, decoder = FrameEncoder(lo, hi, dtype, BINARY_TABLE_EVERY), FrameDecoder()
+        total, worst = 0, 0.0
+        for i, values in enumerate(samples):
+            data = encoder.encode(values, i / 30)
+            total += len(data)
+            _, _, decoded = decoder.decode(data)
+            worst = max(worst, float(np.max(np.abs(decoded - values) / (hi - lo))))
+        rows.append((f"binary {dtype}", 1, total / frames, worst))
+
+    # 28 bytes of IPv4 + UDP header per datagram on the wire
+    print(f"{len(FEATURE_ADDRESSES)} features, {frames} frames, table every {BINARY_TABLE_EVERY}")
+    print(f"{'format':<22}{'datagrams':>10}{'payload B':>11}{'wire B':>9}{'max err':>9}")
+    for name, datagrams, payload, err in rows:
+        print(f"{name:<22}{datagrams:>10}{payload:>11.1f}{payload + 28 * datagrams:>9.1f}"
+              f"{err * 100:>8.3f}%")
+
+if args.measure_encoding:
+    measure_encoding()
+    sys.exit(0)
+
 # Use the helper function to define the model path
 model_path = get_resource_path(MODEL_FILE)
 
@@ -107,24 +223,292 @@ def matrix_to_euler(R: np.ndarray):
     roll  =  np.arctan2(R[2, 1], R[2, 2])
     return np.degrees([yaw, pitch, roll])
 
+def send_features(client, values):
+    for address, value in zip(FEATURE_ADDRESSES, values):
+        client.send_message(address, float(value))
+
+# binary frame output
+binary_encoder = None
+if args.binary_target:
+    host, port = args.binary_target.rsplit(":", 1)
+    binary_addr = (host, int(port))
+    binary_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    lo, hi = np.array(FEATURE_RANGES, dtype=np.float32).T
+    binary_encoder = FrameEncoder(lo, hi, args.binary_dtype, BINARY_TABLE_EVERY)
+    print(f"▶ Sending {args.binary_dtype} binary frames to {args.binary_target}.")
+
+def send_binary(values, t):
+    if binary_encoder is not None:
+        binary_sock.sendto(binary_encoder.encode(values, t), binary_addr)
+
+def emit_features(values, t):
+    """Send one feature vector, representing capture time t, to every output."""
+    send_features(osc, values)
+    send_binary(values, t)
+
+
+class OutputScheduler(threading.Thread):
+    """
+    Sends the feature vector at a fixed rate, independent of the inference rate.
+
+    The value sent at time t is interpolated between the two latest
+    inference frames at (t - delay); past the newest frame it is linearly
+    extrapolated for at most max_extrapolate seconds. After that nothing
+    is sent until the next frame arrives, so a lost face isn't repeated
+    forever. Slots listed in `angles` are degrees and take the shorter
+    way round, so yaw going from 179 to -179 doesn't sweep through 0.
+    """
+
+    def __init__(self, send, rate_hz, delay=OUTPUT_DELAY_S,
+                 max_extrapolate=MAX_EXTRAPOLATE_S, angles=()):
+        super().__init__(name="osc-output", daemon=True)
+        self.send = send
+        self.period = 1.0 / rate_hz
+        self.delay = delay
+        self.max_extrapolate = max_extrapolate
+        self.angles = list(angles)
+        self.ticks = 0
+        self.overruns = 0
+        self.max_lateness = 0.0
+        self._frames = []             # [(t, values)], at most the two newest
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._active = threading.Event()
+        self._active.set()
+
+    def push(self, t, values):
+        """Record an inference result captured at perf_counter() time t."""
+        with self._lock:
+            self._frames = self._frames[-1:] + [(t, np.array(values, dtype=np.float32))]
+
+    def sample(self, t):
+        with self._lock:
+            frames = self._frames
+        if not frames:
+            return None
+        t1, v1 = frames[-1]
+        if t > t1 + self.max_extrapolate:
+            return None
+        if len(frames) < 2 or t1 <= frames[0][0]:
+            return v1
+        t0, v0 = frames[0]
+        w = max(0.0, (t - t0) / (t1 - t0))
+        step = v1 - v0
+        if self.angles:
+            step[self.angles] = (step[self.angles] + 180.0) % 360.0 - 180.0
+        values = v0 + step * w
+        if self.angles:
+            values[self.angles] = (values[self.angles] + 180.0) % 360.0 - 180.0
+        return values
+
+    def pause(self):
+        """Stop sending and forget the old frames so resume doesn't glide from them."""
+        self._active.clear()
+        with self._lock:
+            self._frames = []
+
+    def resume(self):
+        self._active.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._active.set()
+
+    def run(self):
+        next_tick = time.perf_counter()
+        last_report = next_tick
+        reported_overruns = 0
+        while not self._stop_event.is_set():
+            if not self._active.is_set():
+                self._active.wait()
+                next_tick = last_report = time.perf_counter()
+                continue
+            now = time.perf_counter()
+            lateness = now - next_tick
+            self.max_lateness = max(self.max_lateness, lateness)
+            if lateness >= self.period:
+                # we slept through whole ticks; skip them rather than bursting
+                missed = int(lateness // self.period)
+                self.overruns += missed
+                next_tick += missed * self.period
+
+            values = self.sample(now - self.delay)
+            if values is not None:
+                self.send(values, now - self.delay)
+            self.ticks += 1
+            next_tick += self.period
+
+            if now - last_report >= OVERRUN_REPORT_S:
+                if self.overruns > reported_overruns:
+                    print(f"▶ Output scheduler: {self.overruns - reported_overruns} overruns "
+                          f"in the last {now - last_report:.1f}s "
+                          f"(max lateness {self.max_lateness * 1000:.1f} ms)")
+                    reported_overruns = self.overruns
+                self.max_lateness = 0.0
+                last_report = now
+
+            self._stop_event.wait(max(0.0, next_tick - time.perf_counter()))
+
+class PreviewRenderer(threading.Thread):
+    """
+    Draws landmarks, the face ROI and live stats on a downscaled frame.
+
+    submit() only swaps a reference into a single slot, and only when a
+    refresh is due, so the inference loop never waits on drawing, resizing
+    or file/window I/O. Frames that arrive while a render is in progress
+    are dropped. Shows a window, or writes the image atomically to `path`
+    when one is given.
+    """
+
+    def __init__(self, path=None, max_fps=PREVIEW_MAX_FPS, width=PREVIEW_WIDTH):
+        super().__init__(name="preview", daemon=True)
+        self.path = path
+        self.interval = 1.0 / max_fps
+        self.width = width
+        self.rendered = 0
+        self._next_due = 0.0
+        self._pending = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+
+    def submit(self, frame, landmarks, stats):
+        now = time.perf_counter()
+        if now < self._next_due:
+            return
+        self._next_due = now + self.interval
+        with self._lock:
+            self._pending = (frame, landmarks, stats)
+        self._ready.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._ready.set()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._ready.wait()
+            with self._lock:
+                item, self._pending = self._pending, None
+                self._ready.clear()
+            if item is None:
+                continue
+            try:
+                self.show(self.render(*item))
+                self.rendered += 1
+            except Exception as e:
+                print(f"PREVIEW ERROR: {e}")
+        if self.path is None:
+            cv2.destroyAllWindows()
+
+    def render(self, frame, landmarks, stats):
+        h, w = frame.shape[:2]
+        size = (self.width, max(1, round(h * self.width / w)))
+        img = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+        if landmarks is not None:
+            xy = np.array([[lm.x, lm.y] for lm in landmarks], dtype=np.float32) * size
+            xy = np.clip(xy.astype(np.int32), 0, [size[0] - 1, size[1] - 1])
+            img[xy[:, 1], xy[:, 0]] = (0, 255, 0)
+            x0, y0 = xy.min(axis=0)
+            x1, y1 = xy.max(axis=0)
+            cv2.rectangle(img, (int(x0), int(y0)), (int(x1), int(y1)), (0, 200, 255), 1)
+        else:
+            stats = {**stats, "face": "none"}
+
+        for i, (key, value) in enumerate(stats.items()):
+            text = f"{key}: {value:.1f}" if isinstance(value, float) else f"{key}: {value}"
+            cv2.putText(img, text, (6, 14 + 14 * i), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.4, (255, 255, 255), 1, cv2.LINE_AA)
+        return img
+
+    def show(self, img):
+        if self.path is None:
+            cv2.imshow("Face tracker preview", img)
+            cv2.waitKey(1)
+            return
+        # write next to the target and rename, so readers never see half a file
+        root, ext = os.path.splitext(self.path)
+        tmp = f"{root}.tmp{ext}"
+        cv2.imwrite(tmp, img)
+        os.replace(tmp, self.path)
+
+
 # open webcam
-cap = cv2.VideoCapture(WEBCAM_INDEX)
-if not cap.isOpened():
+if args.fake_camera:
+    fake_camera = FakeCamera(args.fake_fail_every, args.fake_outage)
+    open_capture = fake_camera.open
+else:
+    open_capture = lambda: cv2.VideoCapture(WEBCAM_INDEX)
+
+camera = CameraSource(
+    open_capture,
+    on_status=lambda status: osc.send_message("/face/status", status),
+)
+if not camera.open():
     raise RuntimeError("Unable to open webcam. Check WEBCAM_INDEX or permissions.")
 
-fps = cap.get(cv2.CAP_PROP_FPS) or 30
+# MediaPipe VIDEO mode needs increasing timestamps, so this keeps counting
+# across reconnects instead of restarting at 0
 timestamp_ms = 0
 print("▶ Webcam opened successfully.")
 
+scheduler = None
+if args.output_rate > 0:
+    # only OSC is resampled; binary frames go out once per inference frame
+    scheduler = OutputScheduler(lambda values, t: send_features(osc, values),
+                                args.output_rate, delay=args.output_delay, angles=ANGLE_SLOTS)
+    scheduler.start()
+    print(f"▶ OSC output scheduled at {args.output_rate:g} Hz.")
+
+preview = None
+if args.preview or args.preview_file:
+    preview_path = args.preview_file
+    if preview_path is None and sys.platform == "darwin":
+        # HighGUI windows only work from the main thread on macOS
+        preview_path = PREVIEW_FILE
+        print("▶ Preview windows need the main thread on macOS; writing to a file instead.")
+    preview = PreviewRenderer(preview_path, max_fps=args.preview_fps)
+    preview.start()
+    print(f"▶ Preview enabled ({preview_path or 'window'}).")
+
+# inference stats for the preview
+infer_ms = 0.0
+infer_fps = 0.0
+t_last_frame = None
+
+control = None
+if args.control_port > 0:
+    try:
+        control = TrackerControl(osc, OSC_IP, args.control_port)
+        control.start()
+        print(f"▶ Control port listening on {args.control_port}.")
+    except OSError as e:
+        print(f"▶ Control port {args.control_port} unavailable ({e}); running without it.")
+
 
 # This is the new, "uncrashable" main loop.
 try:
     print("▶ Starting detection loop...")
-    while cap.isOpened():
+    while control is None or not control.shutdown_requested.is_set():
         try:
-            ret, frame = cap.read()
+            if control is not None and not control.active.is_set():
+                print("▶ Paused.")
+                if scheduler is not None:
+                    scheduler.pause()
+                if args.pause_release_camera:
+                    camera.release()
+                control.wait_until_resumed()
+                if scheduler is not None:
+                    scheduler.resume()
+                camera.flush()
+                print("▶ Resumed.")
+                continue
+
+            ret, frame = camera.read()
             if not ret:
-                break
+                continue
+            t_capture = time.perf_counter()
 
             # MediaPipe prep
             rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -132,7 +516,20 @@ try:
 
             # inference
             result = landmarker.detect_for_video(mp_img, int(timestamp_ms))
-            timestamp_ms += 1000 / fps
+            timestamp_ms += 1000 / camera.fps
+
+            if preview is not None:
+                t_done = time.perf_counter()
+                infer_ms = ema(infer_ms, (t_done - t_capture) * 1000, 0.9)
+                if t_last_frame is not None:
+                    infer_fps = ema(infer_fps, 1 / max(t_capture - t_last_frame, 1e-6), 0.9)
+                t_last_frame = t_capture
+                preview.submit(
+                    frame,
+                    result.face_landmarks[0] if result.face_landmarks else None,
+                    {"fps": infer_fps, "infer ms": infer_ms, "camera": camera.status,
+                     "overruns": scheduler.overruns if scheduler is not None else 0},
+                )
 
             if not result.face_blendshapes or not result.face_landmarks:
                 continue
@@ -141,24 +538,17 @@ try:
             raw_bs = {b.category_name: b.score for b in result.face_blendshapes[0]}
             for name in TARGETS:
                 smooth_blend[name] = ema(smooth_blend[name], raw_bs.get(name,0.0), ALPHA_BLEND)
-                osc.send_message(f"/face/{name}", float(smooth_blend[name]))
 
             # face‑center
             pts = np.array([[lm.x, lm.y, lm.z] for lm in result.face_landmarks[0]], dtype=np.float32)
             raw_center = pts.mean(axis=0)
             smooth_center = ema(smooth_center, raw_center, ALPHA_CENTER)
-            osc.send_message("/face/center/x", float(smooth_center[0]))
-            osc.send_message("/face/center/y", float(smooth_center[1]))
-            osc.send_message("/face/center/z", float(smooth_center[2]))
 
             # head‑pose
             mat = np.array(result.facial_transformation_matrixes[0]).reshape(4,4)[:3,:3]
             yaw, pitch, roll = matrix_to_euler(mat)
             raw_pose = np.array([yaw,pitch,roll],dtype=np.float32)
             smooth_pose = ema(smooth_pose, raw_pose, ALPHA_POSE)
-            osc.send_message("/face/pose/yaw",   float(smooth_pose[0]))
-            osc.send_message("/face/pose/pitch", float(smooth_pose[1]))
-            osc.send_message("/face/pose/roll",  float(smooth_pose[2]))
 
             # left‑eye normalized center
             lm = result.face_landmarks[0]
@@ -167,8 +557,6 @@ try:
                 (lm[LE_OUTER].y + lm[LE_INNER].y) / 2
             ], dtype=np.float32)
             smooth_leye = ema(smooth_leye, le, ALPHA_TRACK)
-            osc.send_message("/face/eye/left/x", float(smooth_leye[0]))
-            osc.send_message("/face/eye/left/y", float(smooth_leye[1]))
 
             # right‑eye normalized center
             re = np.array([
@@ -176,8 +564,6 @@ try:
                 (lm[RE_OUTER].y + lm[RE_INNER].y) / 2
             ], dtype=np.float32)
             smooth_reye = ema(smooth_reye, re, ALPHA_TRACK)
-            osc.send_message("/face/eye/right/x", float(smooth_reye[0]))
-            osc.send_message("/face/eye/right/y", float(smooth_reye[1]))
 
             # mouth normalized center
             mo = np.array([
@@ -185,8 +571,17 @@ try:
                 (lm[MO_LEFT].y + lm[MO_RIGHT].y) / 2
             ], dtype=np.float32)
             smooth_mouth = ema(smooth_mouth, mo, ALPHA_TRACK)
-            osc.send_message("/face/mouth/x", float(smooth_mouth[0]))
-            osc.send_message("/face/mouth/y", float(smooth_mouth[1]))
+
+            features = np.concatenate([
+                [smooth_blend[name] for name in TARGETS],
+                smooth_center, smooth_pose,
+                smooth_leye, smooth_reye, smooth_mouth,
+            ])
+            if scheduler is not None:
+                scheduler.push(t_capture, features)
+                send_binary(features, t_capture)
+            else:
+                emit_features(features, t_capture)
         
         except Exception as e:
             # If any error happens inside the loop, print it and continue
@@ -194,5 +589,14 @@ try:
 
 finally:
     print("▶ Releasing resources.")
-    cap.release()
+    if control is not None:
+        control.close()
+    if scheduler is not None:
+        scheduler.stop()
+        scheduler.join(timeout=1.0)
+        print(f"▶ Output scheduler: {scheduler.ticks} ticks, {scheduler.overruns} overruns.")
+    if preview is not None:
+        preview.stop()
+        preview.join(timeout=1.0)
+    camera.release()
     landmarker.close()
\ No newline at end of file
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Compact binary frames for the face feature vector
+──────────────────────────────────────────────────
+One UDP datagram per frame instead of one OSC message per value.
+
+Layout (little-endian):
+
+    magic    4s   b"FACE"
+    version  B    1
+    flags    B    bit 0: quantisation table follows the header
+    dtype    B    1 = uint8, 2 = int16
+    count    B    number of channels
+    seq      I    frame counter, wraps at 2**32
+    t_us     Q    sender timestamp in microseconds
+    table    count × (f32 offset, f32 scale)      only when flags & 1
+    values   count × dtype
+
+A channel decodes as offset + q * scale. The table is sent with the first
+frame and then every `table_every` frames, and the decoder caches it. A
+lost frame without the table costs only that frame. Frames can't be
+decoded before the first table arrives (a receiver started late, or the
+frame carrying it was lost), for up to `table_every` frames. A sender
+whose channel count changes has the same gap. Changed ranges with the
+same count decode with the old table until the next table frame.
+
+Run this file directly for a reference receiver that prints decoded frames.
+"""
+
+import sys
+import socket
+import struct
+import argparse
+import numpy as np
+
+MAGIC   = b"FACE"
+VERSION = 1
+FLAG_TABLE = 0x01
+
+HEADER = struct.Struct("<4sBBBBIQ")
+DTYPES = {1: np.dtype("<u1"), 2: np.dtype("<i2")}
+DTYPE_CODES = {"uint8": 1, "int16": 2}
+SEQ_MASK = 0xFFFFFFFF
+REORDER_WINDOW = 256    # frames behind the newest still taken as late; further back is a restart
+
+
+class FrameEncoder:
+    """Quantises feature vectors into binary frames."""
+
+    def __init__(self, lo, hi, dtype="uint8", table_every=30):
+        self.code = DTYPE_CODES[dtype]
+        self.dtype = DTYPES[self.code]
+        info = np.iinfo(self.dtype)
+        self.qmin, self.qmax = info.min, info.max
+
+        lo = np.asarray(lo, dtype=np.float32)
+        hi = np.asarray(hi, dtype=np.float32)
+        self.scale = ((hi - lo) / (self.qmax - self.qmin)).astype(np.float32)
+        self.offset = (lo - self.qmin * self.scale).astype(np.float32)
+        self.table = np.column_stack([self.offset, self.scale]).astype("<f4").tobytes()
+        self.table_every = table_every
+        self.seq = 0
+
+    def encode(self, values, t):
+        """Encode one frame; t is the capture time in seconds."""
+        q = np.rint((np.asarray(values, dtype=np.float32) - self.offset) / self.scale)
+        q = np.clip(q, self.qmin, self.qmax).astype(self.dtype)
+
+        with_table = self.table_every <= 0 or self.seq % self.table_every == 0
+        header = HEADER.pack(MAGIC, VERSION, FLAG_TABLE if with_table else 0,
+                             self.code, len(q), self.seq & SEQ_MASK, int(t * 1e6))
+        self.seq += 1
+        return header + (self.table if with_table else b"") + q.tobytes()
+
+
+class FrameDecoder:
+    """
+    Reference decoder. Counts the frames skipped by forward sequence
+    gaps as `lost`; duplicated or reordered datagrams count as `late` and
+    a sender that restarted its counter as a `reset`, neither as lost.
+    """
+
+    def __init__(self):
+        self.offset = None
+        self.scale = None
+        self.last_seq = None
+        self.lost = 0
+        self.late = 0
+        self.resets = 0
+
+    def decode(self, data):
+        """Return (seq, t, values), or None until a table has been received."""
+        magic, version, flags, code, count, seq, t_us = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a face frame")
+        dtype = DTYPES[code]
+        pos = HEADER.size
+
+        if flags & FLAG_TABLE:
+            table = np.frombuffer(data, dtype="<f4", count=2 * count, offset=pos).reshape(count, 2)
+            self.offset, self.scale = table[:, 0].copy(), table[:, 1].copy()
+            pos += table.nbytes
+
+        gap = None if self.last_seq is None else (seq - self.last_seq) & SEQ_MASK
+        if gap is None or 0 < gap < 2**31:
+            if gap is not None:
+                self.lost += gap - 1
+            self.last_seq = seq
+        elif seq != 0 and (self.last_seq - seq) & SEQ_MASK <= REORDER_WINDOW:
+            self.late += 1      # duplicate or reordered; last_seq stays on the newest
+        else:
+            self.resets += 1    # sender restarted (counts from 0): follow its new counter
+            self.last_seq = seq
+
+        if self.offset is None or len(self.offset) != count:
+            return None
+        q = np.frombuffer(data, dtype=dtype, count=count, offset=pos)
+        return seq, t_us / 1e6, self.offset + q.astype(np.float32) * self.scale
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print binary face frames received over UDP")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9001)
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((args.host, args.port))
+    decoder = FrameDecoder()
+    print(f"▶ Listening for face frames on {args.host}:{args.port}")
+
+    try:
+        while True:
+            data, _ = sock.recvfrom(2048)
+            try:
+                frame = decoder.decode(data)
+            except (ValueError, KeyError, struct.error) as e:
+                print(f"bad frame ({len(data)} bytes): {e}", file=sys.stderr)
+                continue
+            if frame is None:
+                continue
+            seq, t, values = frame
+            print(f"#{seq} t={t:.3f} lost={decoder.lost} "
+                  + " ".join(f"{v:.3f}" for v in values))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+
+
+if __name__ == "__main__":
+    main()
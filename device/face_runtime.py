@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Camera recovery and OSC control for the face tracker
+──────────────────────────────────────────────────────
+CameraSource reopens the webcam after USB drop-outs, FakeCamera stands in
+for it to exercise that without hardware, and TrackerControl takes
+pause / resume / shutdown / ping over OSC. Kept out of the tracker script,
+which starts capturing at import, so they can be imported on their own.
+"""
+
+import time
+import threading
+import cv2
+import numpy as np
+from pythonosc import dispatcher, osc_server
+
+# camera recovery: retry the device with exponential backoff
+RECONNECT_BACKOFF_S     = 1 / 30
+RECONNECT_MAX_BACKOFF_S = 0.25
+
+
+class CameraSource:
+    """
+    Capture wrapper that survives the device going away.
+
+    open_capture() must return an object with the cv2.VideoCapture
+    isOpened/read/get/release interface. When read() fails the device is
+    released and reopened with exponential backoff, from `backoff` (one
+    frame) up to `max_backoff`; read() keeps returning (False, None) until
+    it is back. A short drop-out resumes within a frame or two. After a
+    long outage (a USB replug) it can take up to max_backoff, traded for
+    not running a full OpenCV open, and its warning, every frame while
+    the device is gone. Status changes ("running", "camera_lost",
+    "reconnecting") are passed to on_status.
+    """
+
+    def __init__(self, open_capture, on_status=None,
+                 backoff=RECONNECT_BACKOFF_S, max_backoff=RECONNECT_MAX_BACKOFF_S):
+        self.open_capture = open_capture
+        self.on_status = on_status
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.cap = None
+        self.status = None
+        self.fps = 30
+        self._delay = backoff
+        self._next_attempt = 0.0
+
+    def _set_status(self, status):
+        if status == self.status:
+            return
+        self.status = status
+        print(f"▶ Camera status: {status}")
+        if self.on_status is not None:
+            self.on_status(status)
+
+    def open(self):
+        try:
+            cap = self.open_capture()
+        except Exception as e:
+            print(f"▶ Camera open failed: {e}")
+            cap = None
+        if cap is None or not cap.isOpened():
+            if cap is not None:
+                cap.release()
+            return False
+        self.cap = cap
+        self.fps = cap.get(cv2.CAP_PROP_FPS) or 30
+        self._delay = self.backoff
+        self._set_status("running")
+        return True
+
+    def read(self):
+        if self.cap is None:
+            wait = self._next_attempt - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            if not self.open():
+                self._set_status("reconnecting")
+                self._next_attempt = time.perf_counter() + self._delay
+                self._delay = min(self._delay * 2, self.max_backoff)
+                return False, None
+
+        ret, frame = self.cap.read()
+        if ret:
+            return True, frame
+
+        self.cap.release()
+        self.cap = None
+        self._set_status("camera_lost")
+        self._next_attempt = time.perf_counter() + self._delay
+        return False, None
+
+    def flush(self):
+        """Drop the frame the driver buffered while we weren't reading."""
+        if self.cap is not None:
+            self.cap.grab()
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+class FakeCamera:
+    """
+    Synthetic camera for exercising recovery without hardware: delivers
+    fail_every blank frames, then refuses to read or open for outage seconds.
+    """
+
+    def __init__(self, fail_every=150, outage=2.0, fps=30, size=(480, 640)):
+        self.fail_every = fail_every
+        self.outage = outage
+        self.fps = fps
+        self.frame = np.zeros((*size, 3), dtype=np.uint8)
+        self.frames_left = fail_every
+        self.down_until = 0.0
+
+    def available(self):
+        return time.perf_counter() >= self.down_until
+
+    def open(self):
+        return _FakeCapture(self)
+
+
+class _FakeCapture:
+    def __init__(self, camera):
+        self.camera = camera
+        self.opened = camera.available()
+
+    def isOpened(self):
+        return self.opened
+
+    def get(self, prop):
+        return self.camera.fps if prop == cv2.CAP_PROP_FPS else 0
+
+    def grab(self):
+        return self.read()[0]
+
+    def read(self):
+        cam = self.camera
+        if not self.opened or not cam.available():
+            return False, None
+        if cam.frames_left <= 0:
+            cam.frames_left = cam.fail_every
+            cam.down_until = time.perf_counter() + cam.outage
+            return False, None
+        cam.frames_left -= 1
+        time.sleep(1 / cam.fps)
+        return True, cam.frame.copy()
+
+    def release(self):
+        self.opened = False
+
+
+class TrackerControl:
+    """
+    OSC control listener so the host can idle the tracker instead of killing it.
+
+    /face/control/pause     stop capture and inference, keep the model loaded
+    /face/control/resume    continue tracking
+    /face/control/shutdown  leave the main loop and exit cleanly
+    /face/control/ping      answered with /face/pong <running|paused>
+    """
+
+    def __init__(self, client, host, port):
+        self.client = client
+        self.active = threading.Event()
+        self.active.set()
+        self.shutdown_requested = threading.Event()
+
+        disp = dispatcher.Dispatcher()
+        disp.map("/face/control/pause", self._on_pause)
+        disp.map("/face/control/resume", self._on_resume)
+        disp.map("/face/control/shutdown", self._on_shutdown)
+        disp.map("/face/control/ping", self._on_ping)
+        self.server = osc_server.ThreadingOSCUDPServer((host, port), disp)
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name="osc-control", daemon=True)
+
+    @property
+    def state(self):
+        return "running" if self.active.is_set() else "paused"
+
+    def start(self):
+        self.thread.start()
+
+    def wait_until_resumed(self):
+        self.active.wait()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _on_pause(self, address, *args):
+        if self.active.is_set():
+            self.active.clear()
+            self.client.send_message("/face/status", "paused")
+
+    def _on_resume(self, address, *args):
+        if not self.active.is_set():
+            self.active.set()
+            self.client.send_message("/face/status", "running")
+
+    def _on_shutdown(self, address, *args):
+        self.shutdown_requested.set()
+        self.active.set()
+
+    def _on_ping(self, address, *args):
+        self.client.send_message("/face/pong", self.state)
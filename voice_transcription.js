@@ -5,15 +5,36 @@ const Max = require('max-api');
 const { spawn } = require('child_process');
 const path = require('path');
 const fs = require('fs');
+const net = require('net');
 
 // --- GLOBAL VARIABLES ---
 let transcriptionProcess = null;
 let availableDevices = [];
 let isListening = false;
 let selectedDeviceIndex = null;
+let selectedChannel = 1;    // device input channel from 1; 0 = average all channels
+let useJsonl = false;       // ask the transcriber for JSON-lines events
+let useDictation = false;   // transcribe everything, without the wake word
+let stdoutBuffer = '';      // partial line left over from the last data chunk
+let transcriberReady = false;   // READY seen: Whisper is loaded and warmed up
+
+// Daemon mode: one transcriber process keeps its models loaded and is
+// driven over its control socket, so device scans and start/stop don't
+// reload Whisper. `daemon 0` goes back to a process per scan/start.
+let useDaemon = true;
+let daemonProcess = null;
+let controlSocket = null;
+let controlConnected = false;
+let controlBuffer = '';
+let queuedCommands = [];    // written once the socket is connected
+let pendingReplies = [];    // reply callbacks, in command order
 
 // Path to your compiled application - UPDATE THIS PATH!
-const TRANSCRIBER_PATH = path.join(__dirname, 'whisper_transcriber');
+// Prefer the one-folder build (fast startup); fall back to an old one-file build.
+const TRANSCRIBER_DIR_BUILD = path.join(__dirname, 'whisper_transcriber', 'whisper_transcriber');
+const TRANSCRIBER_PATH = fs.existsSync(TRANSCRIBER_DIR_BUILD)
+    ? TRANSCRIBER_DIR_BUILD
+    : path.join(__dirname, 'whisper_transcriber');
 
 // --- MAX HANDLERS ---
 
@@ -34,6 +55,11 @@ Max.addHandler('set_device', (deviceIndex) => {
     setDevice(deviceIndex);
 });
 
+// Set the device input channel the mic is on (1 = first, 0 = average all)
+Max.addHandler('set_channel', (channel) => {
+    setChannel(channel);
+});
+
 // Start voice transcription
 Max.addHandler('start_listening', () => {
     startListening();
@@ -49,6 +75,39 @@ Max.addHandler('get_status', () => {
     getStatus();
 });
 
+// Switch the transcriber output to JSON lines (adds timing outlets)
+Max.addHandler('jsonl', (enabled) => {
+    useJsonl = parseInt(enabled) !== 0;
+    if (daemonProcess) {
+        // a running daemon switches straight away
+        sendControl(`jsonl ${useJsonl ? 'on' : 'off'}`);
+        Max.post(`JSON-lines output ${useJsonl ? 'on' : 'off'}`);
+    } else {
+        Max.post(`JSON-lines output ${useJsonl ? 'on' : 'off'} (applies from the next transcriber start)`);
+    }
+});
+
+// Dictation: everything said is transcribed, no wake word needed
+Max.addHandler('dictation', (enabled) => {
+    useDictation = parseInt(enabled) !== 0;
+    Max.post(`Dictation ${useDictation ? 'on' : 'off'}`);
+    if (daemonProcess) {
+        // switches straight away, even while listening
+        sendControl(`dictation ${useDictation ? 'on' : 'off'}`);
+    }
+});
+
+// Keep one transcriber running between scans and start/stop (default on)
+Max.addHandler('daemon', (enabled) => {
+    useDaemon = parseInt(enabled) !== 0;
+    Max.post(`Daemon mode ${useDaemon ? 'on' : 'off'}`);
+});
+
+// Quit the transcriber daemon; the next command starts a fresh one
+Max.addHandler('shutdown', () => {
+    shutdownDaemon();
+});
+
 // Test handler
 Max.addHandler('test', () => {
     Max.post("Voice transcription script is loaded and ready!");
@@ -65,6 +124,23 @@ function listAudioDevices() {
         return;
     }
     
+    if (useDaemon) {
+        sendControl('list-devices', (reply) => {
+            if (!reply.startsWith('OK:')) {
+                Max.error(`Failed to list devices: ${reply}`);
+                Max.outlet("error", "device_scan_failed");
+                return;
+            }
+            try {
+                handleDeviceList(JSON.parse(reply.substring(3)));
+            } catch (e) {
+                Max.error("Error parsing device list: " + e);
+                Max.outlet("error", "device_parse_error");
+            }
+        });
+        return;
+    }
+
     Max.post("Launching device scanner...");
     
     const deviceProcess = spawn(TRANSCRIBER_PATH, ['--list-devices']);
@@ -104,23 +180,7 @@ function parseDeviceOutput(output) {
         if (line.startsWith('DEVICES_JSON:')) {
             try {
                 const jsonStr = line.substring(13); // Remove "DEVICES_JSON:" prefix
-                availableDevices = JSON.parse(jsonStr);
-                
-                Max.post(`Found ${availableDevices.length} audio devices:`);
-                
-                // Send device count
-                Max.outlet("device_count", availableDevices.length);
-                
-                // Send each device info
-                for (let i = 0; i < availableDevices.length; i++) {
-                    const device = availableDevices[i];
-                    Max.post(`  ${device.index}: ${device.name} (${device.channels} channels)`);
-                    
-                    // Send device info: index, name, channels
-                    Max.outlet("device_info", device.index, device.name, device.channels);
-                }
-                
-                Max.outlet("status", "devices_listed");
+                handleDeviceList(JSON.parse(jsonStr));
                 return;
                 
             } catch (e) {
@@ -134,6 +194,26 @@ function parseDeviceOutput(output) {
     Max.outlet("error", "no_devices_found");
 }
 
+function handleDeviceList(devices) {
+    availableDevices = devices;
+
+    Max.post(`Found ${availableDevices.length} audio devices:`);
+
+    // Send device count
+    Max.outlet("device_count", availableDevices.length);
+
+    // Send each device info
+    for (let i = 0; i < availableDevices.length; i++) {
+        const device = availableDevices[i];
+        Max.post(`  ${device.index}: ${device.name} (${device.channels} channels)`);
+
+        // Send device info: index, name, channels
+        Max.outlet("device_info", device.index, device.name, device.channels);
+    }
+
+    Max.outlet("status", "devices_listed");
+}
+
 function setDevice(deviceIndex) {
     const index = parseInt(deviceIndex);
     
@@ -158,6 +238,39 @@ function setDevice(deviceIndex) {
     selectedDeviceIndex = index;
     Max.post(`✅ Selected audio device ${selectedDeviceIndex}: ${deviceName}`);
     Max.outlet("device_selected", selectedDeviceIndex, deviceName);
+
+    // A running daemon switches over straight away, even while listening
+    if (daemonProcess) {
+        sendControl(`set-device ${selectedDeviceIndex}`, (reply) => {
+            if (reply !== 'OK') {
+                Max.error(`Failed to switch device: ${reply}`);
+            }
+        });
+    }
+}
+
+function setChannel(channel) {
+    const n = parseInt(channel);
+    const device = availableDevices.find((d) => d.index === selectedDeviceIndex);
+    if (isNaN(n) || n < 0 || (device && n > device.channels)) {
+        Max.error(`Invalid input channel: ${channel}`);
+        Max.outlet("error", "invalid_channel");
+        return;
+    }
+
+    selectedChannel = n;
+    Max.post(n === 0 ? "✅ Using the average of all input channels"
+                     : `✅ Using input channel ${n}`);
+    Max.outlet("channel_selected", selectedChannel);
+
+    // A running daemon switches over straight away, even while listening
+    if (daemonProcess) {
+        sendControl(`set-channel ${selectedChannel}`, (reply) => {
+            if (reply !== 'OK') {
+                Max.error(`Failed to switch channel: ${reply}`);
+            }
+        });
+    }
 }
 
 function startListening() {
@@ -180,9 +293,35 @@ function startListening() {
     }
     
     Max.post(`🎤 Starting voice transcription with device ${selectedDeviceIndex}...`);
+
+    if (useDaemon) {
+        sendControl(`set-device ${selectedDeviceIndex}`);
+        sendControl(`set-channel ${selectedChannel}`);
+        sendControl('start', (reply) => {
+            if (reply !== 'OK') {
+                Max.error(`Failed to start transcription: ${reply}`);
+                Max.outlet("error", "transcription_start_failed");
+                return;
+            }
+            isListening = true;
+            Max.outlet("status", "listening");
+            Max.post(useDictation ? "✅ Dictation started. Start talking!"
+                                  : "✅ Voice transcription started. Say 'Hey Max' to activate!");
+        });
+        return;
+    }
     
     // Start transcription process with selected device
-    const args = ['--device', selectedDeviceIndex.toString()];
+    const args = ['--device', selectedDeviceIndex.toString(),
+                  '--input-channel', selectedChannel.toString()];
+    if (useJsonl) {
+        args.push('--jsonl');
+    }
+    if (useDictation) {
+        args.push('--dictation');
+    }
+    stdoutBuffer = '';
+    transcriberReady = false;
     
     try {
         transcriptionProcess = spawn(TRANSCRIBER_PATH, args);
@@ -218,7 +357,8 @@ function startListening() {
         
         isListening = true;
         Max.outlet("status", "listening");
-        Max.post("✅ Voice transcription started. Say 'Hey Max' to activate!");
+        Max.post(useDictation ? "✅ Dictation started. Start talking!"
+                              : "✅ Voice transcription started. Say 'Hey Max' to activate!");
         
     } catch (e) {
         Max.error(`Critical error starting transcription: ${e.message}`);
@@ -227,6 +367,16 @@ function startListening() {
 }
 
 function stopListening() {
+    if (useDaemon && daemonProcess && isListening) {
+        Max.post("🛑 Stopping voice transcription...");
+        isListening = false;
+        sendControl('stop', () => {
+            Max.outlet("status", "stopped");
+            Max.post("✅ Voice transcription stopped");
+        });
+        return;
+    }
+
     if (!isListening || !transcriptionProcess) {
         Max.post("Not currently listening");
         Max.outlet("status", "not_listening");
@@ -248,42 +398,324 @@ function stopListening() {
 }
 
 function parseTranscriptionOutput(output) {
-    const lines = output.split('\n');
-    
+    // Only handle complete lines; keep the tail for the next chunk
+    const lines = (stdoutBuffer + output).split('\n');
+    stdoutBuffer = lines.pop();
+
     for (let line of lines) {
         line = line.trim();
-        
-        if (line.startsWith('STATUS:')) {
-            const status = line.substring(7).trim();
-            
-            if (status.includes('Listening for')) {
-                Max.outlet("status", "ready");
-            } else if (status.includes('Wake word detected')) {
-                Max.post("🎯 Wake word detected!");
-                Max.outlet("status", "wake_detected");
-            } else if (status.includes('Transcribing')) {
-                Max.outlet("status", "transcribing");
-            }
-            
+
+        if (line.startsWith('{')) {
+            parseJsonEvent(line);
+
+        } else if (line.startsWith('CONTROL:')) {
+            // Daemon control socket is up: "CONTROL:<port>"
+            connectControl(parseInt(line.substring(8)));
+
+        } else if (line === 'READY') {
+            // Wake word, audio and Whisper are all up
+            handleReady();
+
+        } else if (line.startsWith('READY:')) {
+            // Per-component readiness: kws, audio, whisper
+            handleComponentReady(line.substring(6).trim());
+
+        } else if (line.startsWith('STATUS:')) {
+            handleStatus(line.substring(7).trim());
+
+        } else if (line.startsWith('COMMAND:')) {
+            // A known command spotted without Whisper: "COMMAND:<program> <device name>"
+            const command = line.substring(8).trim();
+            const space = command.indexOf(' ');
+            handleCommand(parseInt(command.substring(0, space)), command.substring(space + 1));
+
         } else if (line.startsWith('TRANSCRIPTION:')) {
-            const transcription = line.substring(14).trim();
-            Max.post(`🎯 TRANSCRIPTION: "${transcription}"`);
-            
-            // Main output - send full transcription
-            Max.outlet("transcription", transcription);
-            
-            // Also send individual words for granular control
-            const words = transcription.toLowerCase().split(' ').filter(word => word.length > 0);
-            for (let word of words) {
-                Max.outlet("word", word);
+            handleTranscription(line.substring(14).trim());
+
+        } else if (line.startsWith('PARTIAL:')) {
+            // Dictation: unstable rest of the current phrase, replaces the last one
+            Max.outlet("partial", line.substring(8).trim());
+
+        } else if (line.startsWith('FINAL:')) {
+            // Dictation: newly stable words, to append
+            handleFinal(line.substring(6).trim());
+        }
+    }
+}
+
+// One --jsonl event: {"event": ..., "t": <monotonic seconds>, ...fields}
+function parseJsonEvent(line) {
+    let ev;
+    try {
+        ev = JSON.parse(line);
+    } catch (e) {
+        Max.post("Unparsable event: " + line);
+        return;
+    }
+
+    switch (ev.event) {
+        case 'control':
+            connectControl(ev.port);
+            break;
+        case 'ready':
+            if (ev.component === 'all') {
+                handleReady();
+            } else {
+                handleComponentReady(ev.component);
+            }
+            break;
+        case 'wake':
+            handleStatus('Wake word detected');
+            Max.outlet("timing", "wake_detect", ev.detect_ms);
+            break;
+        case 'recorded':
+            Max.outlet("timing", "capture", ev.capture_s * 1000);
+            break;
+        case 'command':
+            handleCommand(ev.program, ev.name);
+            Max.outlet("timing", "command_latency", ev.latency_ms);
+            break;
+        case 'transcription':
+            if (ev.text) {
+                handleTranscription(ev.text);
+            }
+            Max.outlet("timing", "decode", ev.decode_ms);
+            Max.outlet("timing", "rtf", ev.rtf);
+            if (ev.latency_ms !== undefined) {
+                Max.outlet("timing", "latency", ev.latency_ms);
+            }
+            break;
+        case 'partial':
+            Max.outlet("partial", ev.text);
+            break;
+        case 'final':
+            handleFinal(ev.text);
+            Max.outlet("timing", "dictation_decode", ev.decode_ms);
+            break;
+        case 'dictation':
+            handleStatus('Dictating');
+            break;
+        case 'stopped':
+            if (ev.error) {
+                handleListeningFailed(ev.error);
+            } else {
+                handleListeningEnded();
+            }
+            break;
+        case 'status':
+            handleStatus(ev.message || '');
+            break;
+        case 'error':
+            Max.post("Transcription error: " + (ev.message || line));
+            break;
+    }
+}
+
+function handleReady() {
+    transcriberReady = true;
+    Max.outlet("status", "ready");
+}
+
+function handleComponentReady(component) {
+    Max.post(`✅ ${component} ready`);
+    Max.outlet("component_ready", component);
+}
+
+function handleStatus(status) {
+    if (status.startsWith('Listening stopped:')) {
+        handleListeningFailed(status.substring(18).trim());
+    } else if (status.startsWith('Listening stopped')) {
+        handleListeningEnded();
+    } else if (status.includes('Listening for')) {
+        // Idle again (also after every transcription). Until the READY
+        // line Whisper may still be loading, so that is "listening".
+        Max.outlet("status", transcriberReady ? "ready" : "listening");
+    } else if (status.includes('Wake word detected')) {
+        Max.post("🎯 Wake word detected!");
+        Max.outlet("status", "wake_detected");
+    } else if (status.includes('Transcribing')) {
+        Max.outlet("status", "transcribing");
+    } else if (status.includes('Waiting for Whisper')) {
+        Max.outlet("status", "waiting_for_model");
+    } else if (status.includes('Dictating')) {
+        Max.outlet("status", "dictating");
+    }
+}
+
+// The daemon could not reopen the device after a device or mode change
+function handleListeningFailed(reason) {
+    Max.error(`Transcription stopped: ${reason}`);
+    isListening = false;
+    Max.outlet("status", "stopped");
+    Max.outlet("error", "transcription_start_failed");
+}
+
+// The daemon ended a session we didn't stop (e.g. its input ran out)
+function handleListeningEnded() {
+    if (isListening) {
+        isListening = false;
+        Max.post("Transcription stopped");
+        Max.outlet("status", "stopped");
+    }
+}
+
+function handleCommand(program, deviceName) {
+    Max.post(`🎯 COMMAND: ${deviceName} (program ${program})`);
+    Max.outlet("command", program, deviceName);
+
+    // Commands also go out as a transcription, so patches that route on
+    // the transcription text keep working. Utility commands go out as
+    // spoken ("__GET_STATUS__" -> "get status"), as Whisper would have
+    // transcribed them.
+    if (deviceName.startsWith('__')) {
+        Max.outlet("transcription", deviceName.replace(/^_+|_+$/g, '').replace(/_+/g, ' ').toLowerCase());
+    } else {
+        Max.outlet("transcription", deviceName);
+    }
+}
+
+function handleTranscription(transcription) {
+    Max.post(`🎯 TRANSCRIPTION: "${transcription}"`);
+
+    // Main output - send full transcription
+    Max.outlet("transcription", transcription);
+
+    // Also send individual words for granular control
+    const words = transcription.toLowerCase().split(' ').filter(word => word.length > 0);
+    for (let word of words) {
+        Max.outlet("word", word);
+    }
+
+    // Send word count
+    Max.outlet("word_count", words.length);
+}
+
+// --- DAEMON ---
+
+function ensureDaemon() {
+    if (daemonProcess) {
+        return;
+    }
+    if (!fs.existsSync(TRANSCRIBER_PATH)) {
+        Max.error(`Transcriber not found at ${TRANSCRIBER_PATH}`);
+        Max.outlet("error", "transcriber_not_found");
+        return;
+    }
+
+    Max.post("Launching transcriber daemon...");
+    const args = ['--daemon'];
+    if (useJsonl) {
+        args.push('--jsonl');
+    }
+    if (useDictation) {
+        args.push('--dictation');
+    }
+    stdoutBuffer = '';
+    transcriberReady = false;
+    daemonProcess = spawn(TRANSCRIBER_PATH, args);
+
+    daemonProcess.stdout.on('data', (data) => {
+        parseTranscriptionOutput(data.toString());
+    });
+
+    daemonProcess.stderr.on('data', (data) => {
+        const errorText = data.toString();
+        if (!errorText.includes('DeprecationWarning') &&
+            !errorText.includes('DEBUG:') &&
+            !errorText.includes('STATUS:')) {
+            Max.post("Transcription warning: " + errorText.trim());
+        }
+    });
+
+    daemonProcess.on('close', (code) => {
+        Max.post(`Transcriber daemon ended (exit code: ${code})`);
+        resetDaemon();
+        Max.outlet("status", "stopped");
+    });
+
+    daemonProcess.on('error', (err) => {
+        Max.error(`Failed to start transcriber daemon: ${err.message}`);
+        Max.outlet("error", "transcription_start_failed");
+        resetDaemon();
+    });
+}
+
+function resetDaemon() {
+    if (controlSocket) {
+        controlSocket.destroy();
+    }
+    daemonProcess = null;
+    controlSocket = null;
+    controlConnected = false;
+    controlBuffer = '';
+    queuedCommands = [];
+    transcriberReady = false;
+    // Nobody will answer the commands still in flight
+    const orphans = pendingReplies;
+    pendingReplies = [];
+    for (let onReply of orphans) {
+        onReply('ERROR:transcriber exited');
+    }
+    isListening = false;
+}
+
+function connectControl(port) {
+    controlSocket = net.createConnection({ host: '127.0.0.1', port: port }, () => {
+        controlConnected = true;
+        for (let command of queuedCommands) {
+            controlSocket.write(command + '\n');
+        }
+        queuedCommands = [];
+    });
+
+    // One reply line per command, in order
+    controlSocket.on('data', (data) => {
+        const lines = (controlBuffer + data.toString()).split('\n');
+        controlBuffer = lines.pop();
+        for (let line of lines) {
+            const onReply = pendingReplies.shift();
+            if (onReply) {
+                onReply(line.trim());
             }
-            
-            // Send word count
-            Max.outlet("word_count", words.length);
         }
+    });
+
+    controlSocket.on('error', (err) => {
+        Max.error(`Control socket error: ${err.message}`);
+    });
+}
+
+// Send one command to the daemon, starting it first if needed
+function sendControl(command, onReply) {
+    ensureDaemon();
+    if (!daemonProcess) {
+        if (onReply) {
+            onReply('ERROR:transcriber not running');
+        }
+        return;
+    }
+    pendingReplies.push(onReply || (() => {}));
+    if (controlConnected) {
+        controlSocket.write(command + '\n');
+    } else {
+        queuedCommands.push(command);
     }
 }
 
+function shutdownDaemon() {
+    if (!daemonProcess) {
+        Max.post("Transcriber daemon not running");
+        return;
+    }
+    Max.post("Shutting down transcriber daemon...");
+    sendControl('shutdown');
+}
+
+function handleFinal(text) {
+    Max.post(`📝 ${text}`);
+    Max.outlet("final", text);
+}
+
 function getStatus() {
     if (isListening) {
         Max.outlet("status", "listening");
@@ -304,6 +736,9 @@ process.on('exit', () => {
     if (isListening && transcriptionProcess) {
         transcriptionProcess.kill('SIGTERM');
     }
+    if (daemonProcess) {
+        daemonProcess.kill('SIGTERM');
+    }
 });
 
 /*
@@ -313,19 +748,36 @@ MESSAGES TO SEND TO NODE.SCRIPT:
 - bang                    → Initialize system
 - list_devices           → Scan for audio devices  
 - set_device <index>     → Select audio device
+- set_channel <n>        → Input channel the mic is on (1 = first, default;
+                           0 = average all channels)
 - start_listening        → Start voice transcription
 - stop_listening         → Stop voice transcription
 - get_status            → Get current status
+- jsonl <0|1>           → JSON-lines protocol with timings (a running daemon
+                          switches at once, otherwise from the next start)
+- dictation <0|1>       → Transcribe everything said, without the wake word
+- daemon <0|1>          → Keep one transcriber loaded between scans/starts (default 1)
+- shutdown              → Quit the transcriber daemon
 - test                  → Test if script is working
 
 OUTLETS FROM NODE.SCRIPT:
-- status <message>              → System status updates
+- status <message>              → System status updates; "ready" when idle with
+                                  Whisper loaded (again after each transcription),
+                                  "listening" when idle while Whisper still loads
+- component_ready <name>        → kws / audio / whisper finished loading
 - device_count <number>         → Number of available devices
 - device_info <index> <name> <channels> → Individual device info
 - device_selected <index> <name> → Selected device confirmation
+- channel_selected <n>          → Selected input channel (0 = all)
+- command <program> <name>      → Known command spotted without Whisper (DeviceLoader program)
 - transcription <text>          → 🎯 MAIN OUTPUT: Transcribed speech
 - word <word>                   → Individual words from transcription
 - word_count <number>           → Number of words in transcription
+- partial <text>                → Dictation: unstable end of the current phrase
+                                  (replaces the previous partial; empty when it closed)
+- final <text>                  → Dictation: newly stable words, append them
+- timing <stage> <value>        → jsonl only: wake_detect / capture / decode /
+                                  latency / command_latency / dictation_decode in ms, rtf
 - error <message>               → Error messages
 
 EXAMPLE MAX PATCH SETUP:
@@ -334,5 +786,5 @@ EXAMPLE MAX PATCH SETUP:
 [start_listening] → 
 [stop_listening] →
                     ↓ outlets ↓
-[route status device_count device_info transcription word error]
+[route status device_count device_info command transcription word partial final timing error]
 */
\ No newline at end of file